@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from typing import List, Union
+
+from .asyncconnection import AsyncConnection
+from .commander import (
+    CMD_REPLY_TIMEOUT,
+    CONNECT_TIMEOUT,
+    FLUSH_INPUT_TIMEOUT,
+    L_MSG,
+    L_REPLY_CMD,
+    QUIT_MSG,
+    SEND_RADIO_MSG_TIMEOUT,
+    UPDATE_TIMEOUT,
+    radio_request,
+)
+from .deadline import Deadline
+from .message import Message
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCommander(object):
+    """Asyncio counterpart of Commander.
+
+    Operations on the same cube are serialized, as the cube only handles a
+    single request at a time, but never block the event loop.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.__host: str = host
+        self.__port: int = port
+        self.use_persistent_connection = True
+        self.__connection: AsyncConnection = None
+        self.__unsolicited_messages: List[Message] = []
+        # Created lazily so that it binds to the loop actually running it
+        self.__lock: asyncio.Lock = None
+
+    def __get_lock(self) -> asyncio.Lock:
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        return self.__lock
+
+    async def disconnect(self):
+        async with self.__get_lock():
+            await self.__disconnect()
+
+    def get_unsolicited_messages(self) -> List[Message]:
+        result = self.__unsolicited_messages
+        self.__unsolicited_messages = []
+        return result
+
+    async def update(self) -> List[Message]:
+        deadline = Deadline(UPDATE_TIMEOUT)
+        async with self.__get_lock():
+            if self.__is_connected():
+                try:
+                    response = await self.__call(L_MSG, deadline)
+                    if response:
+                        self.__unsolicited_messages.append(response)
+                except Exception:
+                    await self.__connect(deadline)
+            else:
+                await self.__connect(deadline)
+            if not self.use_persistent_connection:
+                await self.__disconnect()
+            return self.get_unsolicited_messages()
+
+    async def send_radio_msg(self, hex_radio_msg: Union[str, bytes]) -> bool:
+        deadline = Deadline(SEND_RADIO_MSG_TIMEOUT)
+        request = radio_request(hex_radio_msg)
+        async with self.__get_lock():
+            while not deadline.is_expired():
+                if await self.__cmd_send_radio_msg(request, deadline):
+                    return True
+            return False
+
+    async def __cmd_send_radio_msg(self, request: Message, deadline: Deadline) -> bool:
+        try:
+            response = await self.__call(request, deadline)
+            duty_cycle, status_code, free_slots = response.arg.split(",", 3)
+            if status_code == "0":
+                return True
+            logger.debug(
+                "Radio message %s was not send [DutyCycle:%s, StatusCode:%s, FreeSlots:%s]"
+                % (request, duty_cycle, status_code, free_slots)
+            )
+            if int(duty_cycle, 16) == 100 and int(free_slots, 16) == 0:
+                await asyncio.sleep(deadline.remaining(upper_bound=10.0))
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            logger.error("Error sending radio message to Max! Cube: " + str(ex))
+        return False
+
+    async def __call(self, msg: Message, deadline: Deadline) -> Message:
+        already_connected = self.__is_connected()
+        if not already_connected:
+            await self.__connect(deadline.subtimeout(CONNECT_TIMEOUT))
+        else:
+            # Protection in case some late answer arrives for a previous command
+            await self.__wait_for_reply(None, deadline.subtimeout(FLUSH_INPUT_TIMEOUT))
+
+        try:
+            await self.__connection.send(msg)
+            subdeadline = deadline.subtimeout(CMD_REPLY_TIMEOUT)
+            result = await self.__wait_for_reply(msg.reply_cmd(), subdeadline)
+            if result is None:
+                raise TimeoutError(str(subdeadline))
+            return result
+
+        except Exception:
+            await self.__close()
+            if already_connected:
+                return await self.__call(msg, deadline)
+            else:
+                raise
+
+        finally:
+            if not self.use_persistent_connection:
+                await self.__disconnect()
+
+    def __is_connected(self) -> bool:
+        return self.__connection is not None
+
+    async def __connect(self, deadline: Deadline):
+        self.__unsolicited_messages = []
+        self.__connection = await AsyncConnection.open(
+            self.__host, self.__port, deadline
+        )
+        reply = await self.__wait_for_reply(
+            L_REPLY_CMD, deadline.subtimeout(CMD_REPLY_TIMEOUT)
+        )
+        if reply:
+            self.__unsolicited_messages.append(reply)
+
+    async def __wait_for_reply(self, reply_cmd: str, deadline: Deadline) -> Message:
+        while True:
+            msg = await self.__connection.recv(deadline)
+            if msg is None:
+                return None
+            elif reply_cmd and msg.cmd == reply_cmd:
+                return msg
+            else:
+                self.__unsolicited_messages.append(msg)
+
+    async def __disconnect(self):
+        if self.__connection:
+            try:
+                await self.__connection.send(QUIT_MSG)
+            except Exception:
+                logger.debug(
+                    "Unable to properly shutdown MAX Cube connection. Resetting it..."
+                )
+            finally:
+                await self.__close()
+
+    async def __close(self):
+        if self.__connection:
+            await self.__connection.close()
+            self.__connection = None
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+
+from .deadline import Deadline
+from .message import Message
+
+logger = logging.getLogger(__name__)
+
+LINE_SEPARATOR = b"\r\n"
+
+
+class AsyncConnection(object):
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.__reader = reader
+        self.__writer = writer
+
+    @classmethod
+    async def open(cls, host: str, port: int, deadline: Deadline) -> "AsyncConnection":
+        reader, writer = await deadline.wait_for(asyncio.open_connection(host, port))
+        logger.debug("Connected to %s:%d!" % (host, port))
+        return cls(reader, writer)
+
+    async def recv(self, deadline: Deadline) -> Message:
+        try:
+            line = await deadline.wait_for(self.__reader.readuntil(LINE_SEPARATOR))
+        except asyncio.TimeoutError:
+            logger.debug("readline timed out")
+            return None
+        except asyncio.IncompleteReadError:
+            logger.debug("Connection shutdown by remote peer")
+            await self.close()
+            return None
+        msg = Message.decode(line)
+        logger.debug("received: %s" % msg)
+        return msg
+
+    async def send(self, msg: Message):
+        self.__writer.write(msg.encode())
+        await self.__writer.drain()
+        logger.debug("sent: %s" % msg)
+
+    async def close(self):
+        try:
+            self.__writer.close()
+            await self.__writer.wait_closed()
+            logger.debug("closed")
+        except Exception:
+            logger.debug("Unable to close connection. Dropping it...")
@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Callable, List
+
+from .asynccommander import AsyncCommander
+from .cube import DEFAULT_PORT, MaxCubeState
+from .device import MaxDeviceChange
+
+
+class AsyncMaxCube(MaxCubeState):
+    """Asyncio version of MaxCube.
+
+    Nothing is sent to the cube on construction: call connect() (or use the
+    cube as an async context manager) to load the initial state.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_PORT,
+        now: Callable[[], datetime] = datetime.now,
+    ):
+        super(AsyncMaxCube, self).__init__(now)
+        self.__commander = AsyncCommander(host, port)
+
+    async def __aenter__(self) -> "AsyncMaxCube":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.disconnect()
+
+    @property
+    def use_persistent_connection(self) -> bool:
+        return self.__commander.use_persistent_connection
+
+    @use_persistent_connection.setter
+    def use_persistent_connection(self, value: bool) -> None:
+        self.__commander.use_persistent_connection = value
+
+    async def connect(self):
+        await self.update()
+        self.log()
+
+    async def disconnect(self):
+        await self.__commander.disconnect()
+
+    async def update(self) -> List[MaxDeviceChange]:
+        return self.parse_messages(await self.__commander.update())
+
+    async def set_target_temperature(self, thermostat, temperature):
+        return await self.set_temperature_mode(thermostat, temperature, None)
+
+    async def set_mode(self, thermostat, mode):
+        return await self.set_temperature_mode(thermostat, None, mode)
+
+    async def set_temperature_mode(self, thermostat, temperature, mode):
+        command = self._temperature_mode_command(thermostat, temperature, mode)
+        if command is None:
+            return
+        byte_cmd, temperature, mode = command
+        if await self.__commander.send_radio_msg(byte_cmd):
+            self._apply_temperature_mode(thermostat, temperature, mode)
+            return True
+        return False
+
+    async def set_room_temperature(self, room, temperature):
+        return await self.set_room_temperature_mode(room, temperature, None)
+
+    async def set_room_mode(self, room, mode):
+        return await self.set_room_temperature_mode(room, None, mode)
+
+    async def set_room_temperature_mode(self, room, temperature, mode):
+        command = self._room_temperature_mode_command(room, temperature, mode)
+        if command is None:
+            return
+        byte_cmd, members, temperature, mode = command
+        if await self.__commander.send_radio_msg(byte_cmd):
+            for thermostat in members:
+                self._apply_temperature_mode(thermostat, temperature, mode)
+            return True
+        return False
+
+    async def set_programme(self, thermostat, day, metadata):
+        command = self._programme_command(thermostat, day, metadata)
+        if command is None:
+            return
+        return await self.__commander.send_radio_msg(command)
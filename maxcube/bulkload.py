@@ -0,0 +1,150 @@
+from collections import deque
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+from threading import Lock
+from typing import IO, Dict, Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+NUMBER_CHARS = "0123456789+-.eE"
+
+
+def iter_json_array(stream: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """Yield the items of a JSON array one at a time while reading it."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def read_more() -> bool:
+        nonlocal buffer, eof
+        chunk = "" if eof else stream.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+        return not eof
+
+    expected = "["
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if not read_more():
+                raise ValueError("Unexpected end of JSON array")
+        elif expected == "[":
+            if buffer[0] != "[":
+                raise ValueError("Expected a JSON array")
+            buffer = buffer[1:]
+            expected = "item or ]"
+        elif expected != "item" and buffer[0] == "]":
+            return
+        elif expected == ", or ]":
+            if buffer[0] != ",":
+                raise ValueError("Expected ',' or ']' in JSON array")
+            buffer = buffer[1:]
+            expected = "item"
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not read_more():
+                    raise
+                continue
+            # A number may continue in the next chunk, even when a prefix of
+            # it such as "2." or "1e" already decodes
+            if isinstance(item, (int, float)) and not isinstance(item, bool):
+                token_end = len(buffer) - len(buffer.lstrip(NUMBER_CHARS))
+                if token_end == len(buffer) and read_more():
+                    continue
+            buffer = buffer[end:]
+            expected = ", or ]"
+            yield item
+
+
+def interleave(queues: Iterable[List], width: int) -> Iterator:
+    """Take one item in turn from up to width queues at a time.
+
+    Queues are pulled from the iterable only as earlier ones run out, so it
+    can be a generator producing them on demand.
+    """
+    queues = iter(queues)
+    active = deque()
+    while True:
+        while len(active) < width:
+            queue = next(queues, None)
+            if queue is None:
+                break
+            if queue:
+                active.append(deque(queue))
+        if not active:
+            return
+        queue = active.popleft()
+        yield queue.popleft()
+        if queue:
+            active.append(queue)
+
+
+@dataclass
+class ProgrammeLoadResult:
+    """Outcome of loading the programme of one device, by day."""
+
+    rf_address: str
+    sent: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+class ProgrammeJournal(object):
+    """Append-only record of the programme messages accepted by the cube.
+
+    Each line holds the rf address, the day, the radio message in hex and the
+    fingerprint of the day the cube reported before sending it. A later load
+    only skips a message if the cube still reports that same day, as it may
+    not have caught up yet; a day changed since, e.g. by a factory reset, is
+    sent again.
+    """
+
+    def __init__(self, path: str):
+        self.__lock = Lock()
+        self.__sent: Dict[str, str] = {}
+        needs_newline = False
+        if os.path.exists(path):
+            with open(path) as journal:
+                for line in journal:
+                    needs_newline = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                        self.__sent[entry["command"]] = entry["previous"]
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("Ignoring bad journal line: " + line.strip())
+        self.__file = open(path, "a")
+        if needs_newline:
+            # The last line was cut short
+            self.__file.write("\n")
+
+    def covers(self, command: bytes, current: str) -> bool:
+        """Tell whether command was accepted while the day was as current."""
+        return self.__sent.get(command.hex()) == current
+
+    def __len__(self) -> int:
+        return len(self.__sent)
+
+    def record(self, rf_address: str, day: str, command: bytes, previous: str):
+        entry = {
+            "rf_address": rf_address,
+            "day": day,
+            "command": command.hex(),
+            "previous": previous,
+        }
+        with self.__lock:
+            self.__sent[entry["command"]] = previous
+            self.__file.write(json.dumps(entry) + "\n")
+            self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
@@ -0,0 +1,93 @@
+from concurrent.futures import Future
+import logging
+from threading import Lock, Timer
+from typing import Dict, List
+
+from .device import MAX_DEVICE_MODE_AUTOMATIC
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELAY = 0.5
+
+
+class _PendingChange(object):
+    def __init__(self, thermostat):
+        self.thermostat = thermostat
+        self.temperature = None
+        self.mode = None
+        self.futures: List[Future] = []
+        self.timer: Timer = None
+
+
+class TemperatureCoalescer(object):
+    """Collapse bursts of temperature and mode changes for the same device.
+
+    Changes are held for delay seconds after the last request for a device and
+    only the resulting temperature/mode is sent to the cube. Every request
+    gets a future resolved with the result of that single radio message.
+    """
+
+    def __init__(self, cube, delay: float = DEFAULT_DELAY):
+        self.__cube = cube
+        self.__delay = delay
+        self.__lock = Lock()
+        self.__pending: Dict[str, _PendingChange] = {}
+
+    def set_target_temperature(self, thermostat, temperature) -> Future:
+        return self.set_temperature_mode(thermostat, temperature, None)
+
+    def set_mode(self, thermostat, mode) -> Future:
+        return self.set_temperature_mode(thermostat, None, mode)
+
+    def set_temperature_mode(self, thermostat, temperature, mode) -> Future:
+        future = Future()
+        with self.__lock:
+            change = self.__pending.get(thermostat.rf_address)
+            if change is None:
+                change = _PendingChange(thermostat)
+                self.__pending[thermostat.rf_address] = change
+            else:
+                change.timer.cancel()
+            # Switching to automatic mode without a temperature drops the
+            # pending one for the programmed temperature; other modes keep it,
+            # as they would when the requests are sent in turn
+            if mode is not None:
+                change.mode = mode
+                if mode == MAX_DEVICE_MODE_AUTOMATIC:
+                    change.temperature = None
+            if temperature is not None:
+                change.temperature = temperature
+            change.futures.append(future)
+            change.timer = Timer(
+                self.__delay, self.__send, (thermostat.rf_address, change)
+            )
+            change.timer.daemon = True
+            change.timer.start()
+        return future
+
+    def flush(self):
+        """Send all pending changes immediately."""
+        with self.__lock:
+            changes = list(self.__pending.items())
+            for _, change in changes:
+                change.timer.cancel()
+        for rf_address, change in changes:
+            self.__send(rf_address, change)
+
+    def __send(self, rf_address: str, change: _PendingChange):
+        with self.__lock:
+            if self.__pending.get(rf_address) is not change:
+                return
+            del self.__pending[rf_address]
+        if len(change.futures) > 1:
+            logger.debug(f"Coalesced {len(change.futures)} changes for {rf_address}")
+        try:
+            result = self.__cube.set_temperature_mode(
+                change.thermostat, change.temperature, change.mode
+            )
+        except Exception as ex:
+            for future in change.futures:
+                future.set_exception(ex)
+        else:
+            for future in change.futures:
+                future.set_result(result)
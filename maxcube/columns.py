@@ -0,0 +1,110 @@
+from array import array
+from math import isnan, nan
+from typing import Callable, Dict, Iterable, List
+
+from .device import rf_address_to_hex
+
+MISSING = -1
+
+# Column name -> array type code, for the device state kept by DeviceColumns
+COLUMNS = {
+    "rf_address": "L",
+    "room_id": "h",
+    "type": "b",
+    "mode": "b",
+    "battery": "b",
+    "valve_position": "h",
+    "target_temperature": "d",
+    "actual_temperature": "d",
+}
+
+
+def _missing(type_code: str):
+    return nan if type_code == "d" else MISSING
+
+
+def _missing_test(type_code: str) -> Callable[[object], bool]:
+    return isnan if type_code == "d" else (lambda value: value == MISSING)
+
+
+class DeviceColumns(object):
+    """Device state in one typed array per field, one row per device.
+
+    Missing values are stored as NaN in temperature columns and as -1 in
+    the others. The cube keeps the rows up to date as it parses messages.
+    """
+
+    def __init__(self, devices: Iterable = ()):
+        self.__rows: Dict[int, int] = {}
+        self.__columns: Dict[str, array] = {}
+        self.load(devices)
+
+    def load(self, devices: Iterable):
+        """Rebuild every row from the given devices."""
+        self.__rows = {}
+        self.__columns = {name: array(code) for name, code in COLUMNS.items()}
+        for device in devices:
+            if device.rf_int is None or device.rf_int in self.__rows:
+                continue
+            self.__rows[device.rf_int] = len(self.__rows)
+            for name, column in self.__columns.items():
+                if name == "rf_address":
+                    column.append(device.rf_int)
+                else:
+                    column.append(self.__value(name, getattr(device, name, None)))
+
+    def set(self, device, name: str, value):
+        column = self.__columns.get(name)
+        row = self.__rows.get(device.rf_int)
+        if column is not None and row is not None:
+            column[row] = self.__value(name, value)
+
+    def __value(self, name: str, value):
+        if value is None:
+            return _missing(COLUMNS[name])
+        return int(value) if COLUMNS[name] != "d" else float(value)
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+    def column(self, name: str) -> array:
+        return self.__columns[name]
+
+    def rf_addresses(self, rows: Iterable[int]) -> List[str]:
+        rf_addresses = self.__columns["rf_address"]
+        return [rf_address_to_hex(rf_addresses[row]) for row in rows]
+
+    def select(self, name: str, predicate: Callable[[object], bool]) -> List[int]:
+        """Return the rows whose value passes the predicate, skipping missing ones."""
+        is_missing = _missing_test(COLUMNS[name])
+        return [
+            row
+            for row, value in enumerate(self.__columns[name])
+            if not is_missing(value) and predicate(value)
+        ]
+
+    def mean_by_room(self, name: str) -> Dict[int, float]:
+        """Average a column per room, skipping missing values."""
+        is_missing = _missing_test(COLUMNS[name])
+        sums: Dict[int, float] = {}
+        counts: Dict[int, int] = {}
+        for room_id, value in zip(self.__columns["room_id"], self.__columns[name]):
+            if not is_missing(value):
+                sums[room_id] = sums.get(room_id, 0) + value
+                counts[room_id] = counts.get(room_id, 0) + 1
+        return {room_id: sums[room_id] / counts[room_id] for room_id in sums}
+
+    def to_numpy(self) -> Dict:
+        """Return NumPy arrays sharing the memory of the columns.
+
+        Parsing later messages updates the arrays in place, but adding
+        devices reallocates the columns, so export again after that.
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("numpy is required to export device columns")
+        return {
+            name: numpy.frombuffer(column, dtype=column.typecode)
+            for name, column in self.__columns.items()
+        }
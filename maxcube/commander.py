@@ -1,7 +1,11 @@
 import base64
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
 import logging
+from threading import Condition, get_ident
 from time import sleep
-from typing import List
+from typing import List, Union
 
 from .connection import Connection
 from .deadline import Deadline, Timeout
@@ -18,6 +22,73 @@ CONNECT_TIMEOUT = Timeout("connect", 3.0)
 FLUSH_INPUT_TIMEOUT = Timeout("flush-input", 0)
 SEND_RADIO_MSG_TIMEOUT = Timeout("send-radio-msg", 30.0)
 CMD_REPLY_TIMEOUT = Timeout("cmd-reply", 2.0)
+RADIO_MSG_ATTEMPT_TIMEOUT = Timeout("radio-msg-attempt", 5.0)
+LISTEN_TIMEOUT = Timeout("listen", 1.0)
+REQUEST_QUEUE_TIMEOUT = Timeout("request-queue", 30.0)
+PIPELINE_WINDOW = 8
+
+
+@dataclass(frozen=True)
+class RadioStatus:
+    duty_cycle: int
+    accepted: bool
+    free_slots: int
+
+    @staticmethod
+    def parse(arg: str) -> "RadioStatus":
+        duty_cycle, status_code, free_slots = arg.split(",", 3)
+        return RadioStatus(int(duty_cycle, 16), status_code == "0", int(free_slots, 16))
+
+
+class RequestQueue(object):
+    """Grants the cube connection to one request at a time, in arrival order.
+
+    Requests wait for their turn only until the given deadline, after which
+    they start their own. The thread being served can issue nested requests
+    without queueing again.
+    """
+
+    def __init__(self):
+        self.__condition = Condition()
+        self.__waiting = deque()
+        self.__owner: int = None
+        self.__depth = 0
+
+    @contextmanager
+    def serve(self, deadline: Deadline):
+        self.__acquire(deadline)
+        try:
+            yield
+        finally:
+            self.__release()
+
+    def __acquire(self, deadline: Deadline):
+        thread = get_ident()
+        with self.__condition:
+            if self.__owner == thread:
+                self.__depth += 1
+                return
+            ticket = object()
+            self.__waiting.append(ticket)
+            try:
+                while self.__owner is not None or self.__waiting[0] is not ticket:
+                    if deadline.is_expired():
+                        raise TimeoutError(str(deadline))
+                    self.__condition.wait(deadline.remaining())
+            except BaseException:
+                self.__waiting.remove(ticket)
+                self.__condition.notify_all()
+                raise
+            self.__waiting.popleft()
+            self.__owner = thread
+            self.__depth = 1
+
+    def __release(self):
+        with self.__condition:
+            self.__depth -= 1
+            if self.__depth == 0:
+                self.__owner = None
+                self.__condition.notify_all()
 
 
 class Commander(object):
@@ -27,8 +98,13 @@ class Commander(object):
         self.use_persistent_connection = True
         self.__connection: Connection = None
         self.__unsolicited_messages: List[Message] = []
+        self.__requests = RequestQueue()
 
     def disconnect(self):
+        with self.__requests.serve(Deadline(REQUEST_QUEUE_TIMEOUT)):
+            self.__disconnect()
+
+    def __disconnect(self):
         if self.__connection:
             try:
                 self.__connection.send(QUIT_MSG)
@@ -45,7 +121,10 @@ class Commander(object):
         return result
 
     def update(self) -> List[Message]:
-        deadline = Deadline(UPDATE_TIMEOUT)
+        with self.__requests.serve(Deadline(REQUEST_QUEUE_TIMEOUT)):
+            return self.__update(Deadline(UPDATE_TIMEOUT))
+
+    def __update(self, deadline: Deadline) -> List[Message]:
         if self.__is_connected():
             try:
                 response = self.__call(L_MSG, deadline)
@@ -56,29 +135,122 @@ class Commander(object):
         else:
             self.__connect(deadline)
         if not self.use_persistent_connection:
-            self.disconnect()
+            self.__disconnect()
         return self.get_unsolicited_messages()
 
-    def send_radio_msg(self, hex_radio_msg: str) -> bool:
-        deadline = Deadline(SEND_RADIO_MSG_TIMEOUT)
-        request = Message(
-            "s", base64.b64encode(bytearray.fromhex(hex_radio_msg)).decode("utf-8")
-        )
+    def listen(self, timeout: Timeout = LISTEN_TIMEOUT) -> List[Message]:
+        """Collect the messages pushed by the cube during the timeout."""
+        with self.__requests.serve(Deadline(REQUEST_QUEUE_TIMEOUT)):
+            return self.__listen(Deadline(timeout))
+
+    def __listen(self, deadline: Deadline) -> List[Message]:
+        if not self.__is_connected():
+            self.__connect(deadline.subtimeout(CONNECT_TIMEOUT))
+        else:
+            try:
+                self.__wait_for_reply(None, deadline)
+            except Exception:
+                self.__close()
+                raise
+        return self.get_unsolicited_messages()
+
+    def call(self, msg: Message, timeout: Timeout = CMD_REPLY_TIMEOUT) -> Message:
+        with self.__requests.serve(Deadline(REQUEST_QUEUE_TIMEOUT)):
+            return self.__call(msg, Deadline(timeout))
+
+    def send_radio_msg(self, hex_radio_msg: Union[str, bytes]) -> bool:
+        with self.__requests.serve(Deadline(REQUEST_QUEUE_TIMEOUT)):
+            deadline = Deadline(SEND_RADIO_MSG_TIMEOUT)
+            return self.__send_radio_msg(hex_radio_msg, deadline)
+
+    def __send_radio_msg(
+        self, hex_radio_msg: Union[str, bytes], deadline: Deadline
+    ) -> bool:
+        request = radio_request(hex_radio_msg)
         while not deadline.is_expired():
             if self.__cmd_send_radio_msg(request, deadline):
                 return True
         return False
 
+    def try_send_radio_msg(self, hex_radio_msg: Union[str, bytes]) -> RadioStatus:
+        """Make a single attempt to send a radio message."""
+        with self.__requests.serve(Deadline(REQUEST_QUEUE_TIMEOUT)):
+            deadline = Deadline(RADIO_MSG_ATTEMPT_TIMEOUT)
+            request = radio_request(hex_radio_msg)
+            response = self.__call(request, deadline)
+            self.__is_radio_msg_accepted(request, response)
+            return RadioStatus.parse(response.arg)
+
+    def send_radio_msgs(
+        self, hex_radio_msgs: List[str], window: int = PIPELINE_WINDOW
+    ) -> List[bool]:
+        """Send several radio messages without waiting for each reply.
+
+        Up to window requests are written back to back and their replies are
+        matched in order. Requests rejected by the cube, or still pending when
+        the connection fails, are retried one by one with send_radio_msg.
+        """
+        with self.__requests.serve(Deadline(REQUEST_QUEUE_TIMEOUT)):
+            return self.__send_radio_msgs(hex_radio_msgs, window)
+
+    def __send_radio_msgs(self, hex_radio_msgs: List[str], window: int) -> List[bool]:
+        requests = [radio_request(msg) for msg in hex_radio_msgs]
+        results = [False] * len(requests)
+        retries = []
+        pending = deque()
+        sent = 0
+        try:
+            if not self.__is_connected():
+                self.__connect(Deadline(CONNECT_TIMEOUT))
+            else:
+                self.__wait_for_reply(None, Deadline(FLUSH_INPUT_TIMEOUT))
+            while sent < len(requests) or pending:
+                while sent < len(requests) and len(pending) < window:
+                    self.__connection.send(requests[sent])
+                    pending.append((sent, Deadline(SEND_RADIO_MSG_TIMEOUT)))
+                    sent += 1
+                index, deadline = pending[0]
+                request = requests[index]
+                subdeadline = deadline.subtimeout(CMD_REPLY_TIMEOUT)
+                response = self.__wait_for_reply(request.reply_cmd(), subdeadline)
+                if response is None:
+                    # Late replies could no longer be matched to their requests
+                    raise TimeoutError(str(subdeadline))
+                pending.popleft()
+                if self.__is_radio_msg_accepted(request, response):
+                    results[index] = True
+                else:
+                    retries.append(index)
+        except Exception as ex:
+            logger.error("Error pipelining radio messages to Max! Cube: " + str(ex))
+            if self.__is_connected():
+                self.__close()
+            retries.extend(index for index, _ in pending)
+            retries.extend(range(sent, len(requests)))
+
+        for index in sorted(retries):
+            deadline = Deadline(SEND_RADIO_MSG_TIMEOUT)
+            results[index] = self.__send_radio_msg(hex_radio_msgs[index], deadline)
+        if not self.use_persistent_connection:
+            self.__disconnect()
+        return results
+
+    def __is_radio_msg_accepted(self, request: Message, response: Message) -> bool:
+        duty_cycle, status_code, free_slots = response.arg.split(",", 3)
+        if status_code == "0":
+            return True
+        logger.debug(
+            "Radio message %s was not send [DutyCycle:%s, StatusCode:%s, FreeSlots:%s]"
+            % (request, duty_cycle, status_code, free_slots)
+        )
+        return False
+
     def __cmd_send_radio_msg(self, request: Message, deadline: Deadline) -> bool:
         try:
             response = self.__call(request, deadline)
-            duty_cycle, status_code, free_slots = response.arg.split(",", 3)
-            if status_code == "0":
+            if self.__is_radio_msg_accepted(request, response):
                 return True
-            logger.debug(
-                "Radio message %s was not send [DutyCycle:%s, StatusCode:%s, FreeSlots:%s]"
-                % (request, duty_cycle, status_code, free_slots)
-            )
+            duty_cycle, status_code, free_slots = response.arg.split(",", 3)
             if int(duty_cycle, 16) == 100 and int(free_slots, 16) == 0:
                 sleep(deadline.remaining(upper_bound=10.0))
         except Exception as ex:
@@ -110,7 +282,7 @@ class Commander(object):
 
         finally:
             if not self.use_persistent_connection:
-                self.disconnect()
+                self.__disconnect()
 
     def __is_connected(self) -> bool:
         return self.__connection is not None
@@ -137,3 +309,10 @@ class Commander(object):
     def __close(self):
         self.__connection.close()
         self.__connection = None
+
+
+def radio_request(radio_msg: Union[str, bytes]) -> Message:
+    """Build the s: request for a radio message, given as bytes or in hex."""
+    if isinstance(radio_msg, str):
+        radio_msg = bytes.fromhex(radio_msg)
+    return Message("s", base64.b64encode(radio_msg).decode("utf-8"))
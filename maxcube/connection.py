@@ -7,36 +7,57 @@ from .message import Message
 logger = logging.getLogger(__name__)
 
 BLOCK_SIZE = 4096
+MAX_LINE_LENGTH = 16384
+BUFFER_SIZE = MAX_LINE_LENGTH + BLOCK_SIZE
 DEFAULT_TIMEOUT = 2.0
 
 
 class Connection(object):
     def __init__(self, host: str, port: int):
-        self.__buffer: bytearray = bytearray()
+        # Received data lives in buffer[start:end]; lines are decoded in place
+        # and only a pending partial line is ever moved back to the front.
+        self.__buffer: bytearray = bytearray(BUFFER_SIZE)
+        self.__view: memoryview = memoryview(self.__buffer)
+        self.__start: int = 0
+        self.__end: int = 0
+        self.__scan: int = 0
         self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.__socket.settimeout(DEFAULT_TIMEOUT)
         self.__socket.connect((host, port))
         logger.debug("Connected to %s:%d!" % (host, port))
 
     def __read_buffered_msg(self) -> Message:
-        buf = self.__buffer
-        pos = buf.find(b"\r\n")
+        pos = self.__buffer.find(b"\r\n", self.__scan, self.__end)
         if pos < 0:
+            if self.__end - self.__start > MAX_LINE_LENGTH:
+                raise ValueError(f"Line exceeds {MAX_LINE_LENGTH} bytes")
+            # Next search only needs to check the new data
+            self.__scan = max(self.__start, self.__end - 1)
             return None
-        result = buf[0:pos]
-        del buf[0 : pos + 2]
-        return Message.decode(result)
+        msg = Message.decode(self.__view[self.__start : pos])
+        self.__start = self.__scan = pos + 2
+        if self.__start == self.__end:
+            self.__start = self.__end = self.__scan = 0
+        return msg
+
+    def __recv_into_buffer(self) -> int:
+        if self.__end + BLOCK_SIZE > BUFFER_SIZE:
+            pending = self.__end - self.__start
+            self.__view[0:pending] = self.__view[self.__start : self.__end]
+            self.__scan -= self.__start
+            self.__start, self.__end = 0, pending
+        size = self.__socket.recv_into(self.__view[self.__end :], BLOCK_SIZE)
+        self.__end += size
+        return size
 
     def recv(self, deadline: Deadline) -> Message:
         msg = self.__read_buffered_msg()
         try:
             while msg is None:
                 self.__socket.settimeout(deadline.remaining(lower_bound=0.001))
-                tmp = self.__socket.recv(BLOCK_SIZE)
-                if len(tmp) > 0:
-                    self.__buffer.extend(tmp)
+                if self.__recv_into_buffer() > 0:
                     msg = self.__read_buffered_msg()
-                    logger.debug("received: %s" % msg)
+                    logger.debug("received: %s", msg)
                 else:
                     logger.debug("Connection shutdown by remote peer")
                     self.close()
@@ -49,7 +70,7 @@ class Connection(object):
 
     def send(self, msg: Message):
         self.__socket.send(msg.encode())
-        logger.debug("sent: %s" % msg)
+        logger.debug("sent: %s", msg)
 
     def close(self):
         try:
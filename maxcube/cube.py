@@ -1,9 +1,18 @@
 import base64
+from collections import deque
+from concurrent.futures import (
+    CancelledError,
+    Future,
+    TimeoutError as FutureTimeoutError,
+)
 from datetime import datetime
+from itertools import islice
 import json
 import logging
 import struct
-from typing import Callable
+from threading import Lock, RLock
+from time import monotonic
+from typing import Callable, Dict, List
 
 from maxcube.device import (
     MAX_CUBE,
@@ -14,105 +23,176 @@ from maxcube.device import (
     MAX_WALL_THERMOSTAT,
     MAX_WINDOW_SHUTTER,
     MaxDevice,
+    MaxDeviceChange,
+    rf_address_to_int,
 )
 from maxcube.room import MaxRoom
 from maxcube.thermostat import MaxThermostat
 from maxcube.wallthermostat import MaxWallThermostat
 from maxcube.windowshutter import MaxWindowShutter
 
-from .commander import Commander
+from .bulkload import (
+    ProgrammeJournal,
+    ProgrammeLoadResult,
+    interleave,
+    iter_json_array,
+)
+from .columns import DeviceColumns
+from .commander import RADIO_MSG_ATTEMPT_TIMEOUT, Commander
+from .deadline import Timeout
+from .programme import (
+    DAYS,
+    ProgrammeUpload,
+    WeeklyProgramme,
+    day_fingerprint,
+    encode_day,
+    encode_set_point,
+    same_day,
+)
+from .scheduler import RadioScheduler
 
 logger = logging.getLogger(__name__)
 
 CMD_SET_PROG = "10"
+CMD_SET_TEMP = "40"
 UNKNOWN = "00"
 RF_FLAG_IS_ROOM = "04"
 RF_FLAG_IS_DEVICE = "00"
 RF_NULL_ADDRESS = "000000"
 DEFAULT_PORT = 62910
-DAYS = [
-    "saturday",
-    "sunday",
-    "monday",
-    "tuesday",
-    "wednesday",
-    "thursday",
-    "friday",
-    "saturday",
-    "sunday",
-]
-
-
-class MaxCube(MaxDevice):
-    def __init__(
-        self,
-        host: str,
-        port: int = DEFAULT_PORT,
-        now: Callable[[], datetime] = datetime.now,
-    ):
-        super(MaxCube, self).__init__()
-        self.__commander = Commander(host, port)
+SET_TEMP_HEADER = bytes.fromhex(
+    UNKNOWN + RF_FLAG_IS_ROOM + CMD_SET_TEMP + RF_NULL_ADDRESS
+)
+SET_ROOM_PROG_HEADER = bytes.fromhex(
+    UNKNOWN + RF_FLAG_IS_ROOM + CMD_SET_PROG + RF_NULL_ADDRESS
+)
+SET_DEVICE_PROG_HEADER = bytes.fromhex(
+    UNKNOWN + RF_FLAG_IS_DEVICE + CMD_SET_PROG + RF_NULL_ADDRESS
+)
+# Bulk programme uploads wait behind each other and the duty cycle pauses
+PROGRAMME_UPLOAD_TIMEOUT = Timeout("programme-upload", 300.0)
+PROGRAMME_UPLOAD_WINDOW = 4
+THERMOSTAT_TYPES = (MAX_THERMOSTAT, MAX_THERMOSTAT_PLUS)
+# L message record: length and 24 bit rf address, unknown, flags, flags
+L_RECORD_HEADER = struct.Struct(">IxxB")
+# Thermostat valve position and target temperature, then actual temperature
+L_THERMOSTAT_STATE = struct.Struct(">BB")
+L_THERMOSTAT_ACTUAL = struct.Struct(">H")
+
+
+class MaxCubeState(MaxDevice):
+    def __init__(self, now: Callable[[], datetime] = datetime.now):
+        super(MaxCubeState, self).__init__()
         self.name = "Cube"
         self.type = MAX_CUBE
         self.firmware_version = None
         self.devices = []
         self.rooms = []
         self._now: Callable[[], datetime] = now
-        self.update()
-        self.log()
-
-    @property
-    def use_persistent_connection(self) -> bool:
-        return self.__commander.use_persistent_connection
-
-    @use_persistent_connection.setter
-    def use_persistent_connection(self, value: bool) -> None:
-        self.__commander.use_persistent_connection = value
-
-    def disconnect(self):
-        self.__commander.disconnect()
+        self.__changes: List[MaxDeviceChange] = None
+        self.__index_key = None
+        self.__devices_by_rf: Dict[int, MaxDevice] = {}
+        self.__rooms_by_id: Dict[int, MaxRoom] = {}
+        self.__devices_by_room_id: Dict[int, List[MaxDevice]] = {}
+        # Last payloads applied, to skip the ones the cube sends unchanged
+        self.__m_payload: str = None
+        self.__c_payloads: Dict[int, str] = {}
+        self.__l_payload: str = None
+        self.__l_payload_records = 0
+        self.__l_records: Dict[int, bytes] = {}
+        self.records_parsed = 0
+        self.records_skipped = 0
+        self.columns: DeviceColumns = None
 
     def __str__(self):
         return self.describe("CUBE", f"firmware={self.firmware_version}")
 
     def log(self):
+        if not logger.isEnabledFor(logging.INFO):
+            # Describing devices would decode their configuration
+            return
         logger.info(str(self))
         for room in self.rooms:
             logger.info(f" * ROOM {room.name}")
             for device in self.devices_by_room(room):
                 logger.info(" --- " + str(device))
 
-    def update(self):
-        self.__parse_responses(self.__commander.update())
-
     def get_devices(self):
         return self.devices
 
     def device_by_rf(self, rf):
-        for device in self.devices:
-            if device.rf_address == rf:
-                return device
-        return None
+        self.__check_index()
+        try:
+            return self.__devices_by_rf.get(rf_address_to_int(rf))
+        except ValueError:
+            return None
 
     def devices_by_room(self, room):
-        rooms = []
+        self.__check_index()
+        return list(self.__devices_by_room_id.get(room.id, ()))
 
-        for device in self.devices:
-            if device.room_id == room.id:
-                rooms.append(device)
-
-        return rooms
+    def get_programmed_temps_at(self, dt: datetime) -> Dict[str, float]:
+        """Retrieve the programmed temperature of every thermostat at dt."""
+        return {
+            device.rf_address: device.get_programmed_temp_at(dt)
+            for device in self.devices
+            if device.is_thermostat()
+        }
 
     def get_rooms(self):
         return self.rooms
 
     def room_by_id(self, id):
-        for room in self.rooms:
-            if room.id == id:
-                return room
-        return None
+        self.__check_index()
+        return self.__rooms_by_id.get(id)
 
-    def __parse_responses(self, messages):
+    def __check_index(self):
+        # Devices and rooms are public lists, so also catch direct additions
+        key = self.__index_key_now()
+        if key == self.__index_key:
+            return
+        devices_by_rf = {}
+        devices_by_room_id = {}
+        for device in self.devices:
+            devices_by_rf.setdefault(device.rf_int, device)
+            devices_by_room_id.setdefault(device.room_id, []).append(device)
+        rooms_by_id = {}
+        for room in self.rooms:
+            rooms_by_id.setdefault(room.id, room)
+        self.__devices_by_rf = devices_by_rf
+        self.__devices_by_room_id = devices_by_room_id
+        self.__rooms_by_id = rooms_by_id
+        self.__index_key = key
+        self.forget_payloads()
+        if self.columns is not None:
+            self.columns.load(self.devices)
+
+    def enable_columns(self) -> DeviceColumns:
+        """Also keep the device state in a columnar store, see DeviceColumns."""
+        if self.columns is None:
+            self.columns = DeviceColumns(self.devices)
+        return self.columns
+
+    def forget_payloads(self):
+        """Parse the next messages even if their payloads did not change."""
+        self.__m_payload = None
+        self.__c_payloads.clear()
+        self.__l_payload = None
+        self.__l_records.clear()
+
+    def __index_key_now(self):
+        return id(self.devices), len(self.devices), id(self.rooms), len(self.rooms)
+
+    def parse_messages(self, messages) -> List[MaxDeviceChange]:
+        """Apply the messages and return the device changes they caused."""
+        self.__changes = []
+        try:
+            self.__parse_messages(messages)
+            return self.__changes
+        finally:
+            self.__changes = None
+
+    def __parse_messages(self, messages):
         for msg in messages:
             try:
                 cmd = msg.cmd
@@ -130,30 +210,23 @@ class MaxCube(MaxDevice):
                 logger.warn(f"Error processing response message {msg}", exc_info=True)
 
     def parse_c_message(self, message):
-        logger.debug("Parsing c_message: " + message)
         params = message.split(",")
-        device_rf_address = params[0].upper()
-        data = bytearray(base64.b64decode(params[1]))
-
-        device = self.device_by_rf(device_rf_address)
-        if device and device.is_thermostat():
-            device.comfort_temperature = data[18] / 2.0
-            device.eco_temperature = data[19] / 2.0
-            device.max_temperature = data[20] / 2.0
-            device.min_temperature = data[21] / 2.0
-            device.programme = get_programme(data[29:])
-
-        if device and device.is_wallthermostat():
-            device.comfort_temperature = data[18] / 2.0
-            device.eco_temperature = data[19] / 2.0
-            device.max_temperature = data[20] / 2.0
-            device.min_temperature = data[21] / 2.0
-
-        if device and device.is_windowshutter():
-            # Pure Speculation based on this:
-            # Before: [17][12][162][178][4][0][20][15]KEQ0839778
-            # After:  [17][12][162][178][4][1][20][15]KEQ0839778
-            device.initialized = data[5]
+        device = self.device_by_rf(int(params[0], 16))
+        if device is None:
+            return
+        if self.__c_payloads.get(device.rf_int) == params[1]:
+            self.records_skipped += 1
+            return
+        logger.debug("Parsing c_message: " + message)
+        self.records_parsed += 1
+
+        if device.config_decoded:
+            # The previous values were seen, so report what changed
+            for field, value in device.decode_config(params[1]).items():
+                self.__set(device, field, value)
+        else:
+            device.set_config(params[1])
+        self.__c_payloads[device.rf_int] = params[1]
 
     def parse_h_message(self, message):
         logger.debug("Parsing h_message: " + message)
@@ -163,7 +236,11 @@ class MaxCube(MaxDevice):
         self.firmware_version = (tokens[2][0:2]) + "." + (tokens[2][2:4])
 
     def parse_m_message(self, message):
+        if message == self.__m_payload:
+            self.records_skipped += 1
+            return
         logger.debug("Parsing m_message: " + message)
+        self.records_parsed += 1
         data = bytearray(base64.b64decode(message.split(",")[2]))
         num_rooms = data[2]
 
@@ -174,7 +251,7 @@ class MaxCube(MaxDevice):
             pos += 1 + 1
             name = data[pos : pos + name_length].decode("utf-8")
             pos += name_length
-            device_rf_address = self.parse_rf_address(data[pos : pos + 3])
+            # Skip the rf address of the room group
             pos += 3
 
             room = self.room_by_id(room_id)
@@ -184,6 +261,8 @@ class MaxCube(MaxDevice):
                 room.id = room_id
                 room.name = name
                 self.rooms.append(room)
+                self.__rooms_by_id[room_id] = room
+                self.__index_key = self.__index_key_now()
             else:
                 room.name = name
 
@@ -192,7 +271,7 @@ class MaxCube(MaxDevice):
 
         for device_idx in range(0, num_devices):
             device_type = data[pos]
-            device_rf_address = self.parse_rf_address(data[pos + 1 : pos + 1 + 3])
+            device_rf_address = int.from_bytes(data[pos + 1 : pos + 1 + 3], "big")
             device_serial = data[pos + 4 : pos + 14].decode("utf-8")
             device_name_length = data[pos + 14]
             device_name = data[pos + 15 : pos + 15 + device_name_length].decode("utf-8")
@@ -211,77 +290,94 @@ class MaxCube(MaxDevice):
                     device = MaxWallThermostat()
 
                 if device:
+                    device.rf_address = device_rf_address
                     self.devices.append(device)
+                    self.__devices_by_rf[device_rf_address] = device
+                    self.__index_key = self.__index_key_now()
 
             if device:
                 device.type = device_type
-                device.rf_address = device_rf_address
                 device.room_id = room_id
                 device.name = device_name
                 device.serial = device_serial
 
             pos += 1 + 3 + 10 + device_name_length + 2
 
+        # Devices may have moved to another room
+        self.__index_key = None
+        self.__check_index()
+        self.__m_payload = message
+
     def parse_l_message(self, message):
-        logger.debug("Parsing l_message: " + message)
-        data = bytearray(base64.b64decode(message))
+        self.__check_index()
+        if message == self.__l_payload:
+            self.records_skipped += self.__l_payload_records
+            return
+        logger.debug("Parsing l_message: %s", message)
+        data = memoryview(base64.b64decode(message))
         pos = 0
+        records = 0
 
         while pos < len(data):
-            length = data[pos]
-            device_rf_address = self.parse_rf_address(data[pos + 1 : pos + 4])
-
-            device = self.device_by_rf(device_rf_address)
-
-            if device:
-                bits1, bits2 = struct.unpack("BB", bytearray(data[pos + 5 : pos + 7]))
-                device.battery = self.resolve_device_battery(bits2)
-
-            # Thermostat or Wall Thermostat
-            if device and (device.is_thermostat() or device.is_wallthermostat()):
-                device.target_temperature = (data[pos + 8] & 0x7F) / 2.0
-                bits1, bits2 = struct.unpack("BB", bytearray(data[pos + 5 : pos + 7]))
-                device.mode = self.resolve_device_mode(bits2)
-
-            # Thermostat
-            if device and device.is_thermostat():
-                device.valve_position = data[pos + 7]
-                if (
-                    device.mode == MAX_DEVICE_MODE_MANUAL
-                    or device.mode == MAX_DEVICE_MODE_AUTOMATIC
-                ):
-                    actual_temperature = (
-                        (data[pos + 9] & 0xFF) * 256 + (data[pos + 10] & 0xFF)
-                    ) / 10.0
-                    if actual_temperature != 0:
-                        device.actual_temperature = actual_temperature
-                else:
-                    device.actual_temperature = None
-
-            # Wall Thermostat
-            if device and device.is_wallthermostat():
-                device.actual_temperature = (
-                    ((data[pos + 8] & 0x80) << 1) + data[pos + 12]
-                ) / 10.0
-
-            # Window Shutter
-            if device and device.is_windowshutter():
-                status = data[pos + 6] & 0x03
-                if status > 0:
-                    device.is_open = True
-                else:
-                    device.is_open = False
+            header, flags = L_RECORD_HEADER.unpack_from(data, pos)
+            length = header >> 24
+            rf_address = header & 0xFFFFFF
+            record = data[pos : pos + length + 1]
+            records += 1
+            if self.__l_records.get(rf_address) == record:
+                self.records_skipped += 1
+            else:
+                device = self.__devices_by_rf.get(rf_address)
+                if device:
+                    self.__parse_l_record(device, data, pos, flags)
+                    self.__l_records[rf_address] = bytes(record)
+                self.records_parsed += 1
 
             # Advance our pointer to the next submessage
             pos += length + 1
 
-    def set_target_temperature(self, thermostat, temperature):
-        return self.set_temperature_mode(thermostat, temperature, None)
-
-    def set_mode(self, thermostat, mode):
-        return self.set_temperature_mode(thermostat, None, mode)
-
-    def set_temperature_mode(self, thermostat, temperature, mode):
+        self.__l_payload = message
+        self.__l_payload_records = records
+
+    def __parse_l_record(self, device, data, pos, flags):
+        self.__set(device, "battery", self.resolve_device_battery(flags))
+        device_type = device.type
+
+        if device_type in THERMOSTAT_TYPES:
+            valve_position, temperature = L_THERMOSTAT_STATE.unpack_from(data, pos + 7)
+            self.__set(device, "target_temperature", (temperature & 0x7F) / 2.0)
+            self.__set(device, "mode", self.resolve_device_mode(flags))
+            self.__set(device, "valve_position", valve_position)
+            if (
+                device.mode == MAX_DEVICE_MODE_MANUAL
+                or device.mode == MAX_DEVICE_MODE_AUTOMATIC
+            ):
+                (actual,) = L_THERMOSTAT_ACTUAL.unpack_from(data, pos + 9)
+                if actual != 0:
+                    self.__set(device, "actual_temperature", actual / 10.0)
+            else:
+                self.__set(device, "actual_temperature", None)
+
+        elif device_type == MAX_WALL_THERMOSTAT:
+            temperature = data[pos + 8]
+            self.__set(device, "target_temperature", (temperature & 0x7F) / 2.0)
+            self.__set(device, "mode", self.resolve_device_mode(flags))
+            actual = ((temperature & 0x80) << 1) + data[pos + 12]
+            self.__set(device, "actual_temperature", actual / 10.0)
+
+        elif device_type == MAX_WINDOW_SHUTTER:
+            self.__set(device, "is_open", (flags & 0x03) > 0)
+
+    def __set(self, device, field, value):
+        old = getattr(device, field, None)
+        if old != value:
+            setattr(device, field, value)
+            if self.columns is not None:
+                self.columns.set(device, field, value)
+            if self.__changes is not None:
+                self.__changes.append(MaxDeviceChange(device, field, old, value))
+
+    def _temperature_mode_command(self, thermostat, temperature, mode):
         logger.debug(
             "Setting temperature %s and mode %s on %s!",
             temperature,
@@ -291,58 +387,112 @@ class MaxCube(MaxDevice):
 
         if not thermostat.is_thermostat() and not thermostat.is_wallthermostat():
             logger.error("%s is no (wall-)thermostat!", thermostat.rf_address)
-            return
+            return None
+
+        return self.__temperature_mode_command(
+            thermostat, thermostat.room_id, temperature, mode
+        )
+
+    def _room_temperature_mode_command(self, room, temperature, mode):
+        logger.debug(
+            "Setting temperature %s and mode %s on room %s!",
+            temperature,
+            mode,
+            room.name,
+        )
 
+        members = [
+            device
+            for device in self.devices_by_room(room)
+            if device.is_thermostat() or device.is_wallthermostat()
+        ]
+        if not members:
+            logger.error("Room %s has no (wall-)thermostat!", room.name)
+            return None
+
+        # The room flag makes the cube address every device of the group
+        byte_cmd, temperature, mode = self.__temperature_mode_command(
+            members[0], room.id, temperature, mode
+        )
+        return byte_cmd, members, temperature, mode
+
+    def __temperature_mode_command(self, reference, room_id, temperature, mode):
         if mode is None:
-            mode = thermostat.mode
+            mode = reference.mode
         if temperature is None:
             temperature = (
-                0
-                if mode == MAX_DEVICE_MODE_AUTOMATIC
-                else thermostat.target_temperature
+                0 if mode == MAX_DEVICE_MODE_AUTOMATIC else reference.target_temperature
             )
 
-        rf_address = thermostat.rf_address
-        room = to_hex(thermostat.room_id)
         target_temperature = int(temperature * 2) + (mode << 6)
-
-        byte_cmd = "000440000000" + rf_address + room + to_hex(target_temperature)
-        if self.__commander.send_radio_msg(byte_cmd):
-            thermostat.mode = mode
-            if temperature > 0:
-                thermostat.target_temperature = int(temperature * 2) / 2.0
-            elif mode == MAX_DEVICE_MODE_AUTOMATIC:
-                thermostat.target_temperature = thermostat.get_programmed_temp_at(
-                    self._now()
-                )
-            return True
-        return False
-
-    def set_programme(self, thermostat, day, metadata):
+        byte_cmd = (
+            SET_TEMP_HEADER
+            + reference.rf_int.to_bytes(3, "big")
+            + bytes((room_id, target_temperature))
+        )
+        return byte_cmd, temperature, mode
+
+    def _apply_temperature_mode(self, thermostat, temperature, mode):
+        # The cube may still report the previous state, which must then win
+        self.__l_payload = None
+        self.__l_records.pop(thermostat.rf_int, None)
+        self.__set(thermostat, "mode", mode)
+        if temperature > 0:
+            self.__set(thermostat, "target_temperature", int(temperature * 2) / 2.0)
+        elif mode == MAX_DEVICE_MODE_AUTOMATIC and thermostat.is_thermostat():
+            # Wall thermostats have no programme, they report their target later
+            programmed = thermostat.get_programmed_temp_at(self._now())
+            self.__set(thermostat, "target_temperature", programmed)
+
+    def _programme_command(self, thermostat, day, metadata):
         # compare with current programme
-        if thermostat.programme[day] == metadata:
+        if same_day(getattr(thermostat, "programme", None), day, metadata):
             logger.debug("Skipping setting unchanged programme for " + day)
-            return
+            return None
 
-        heat_time_tuples = [(x["temp"], x["until"]) for x in metadata]
-        # pad heat_time_tuples so that there are always seven
-        for _ in range(7 - len(heat_time_tuples)):
-            heat_time_tuples.append((0, "00:00"))
-        command = ""
         if thermostat.is_room():
-            rf_flag = RF_FLAG_IS_ROOM
+            header = SET_ROOM_PROG_HEADER
             devices = self.devices_by_room(thermostat)
         else:
-            rf_flag = RF_FLAG_IS_DEVICE
+            header = SET_DEVICE_PROG_HEADER
             devices = [thermostat]
-        command += UNKNOWN + rf_flag + CMD_SET_PROG + RF_NULL_ADDRESS
+        return self.__programme_upload(header, devices, day, metadata).command
+
+    def _plan_week_programme(self, target, programme) -> List[ProgrammeUpload]:
+        """Work out the radio messages giving a thermostat or room a programme.
+
+        Days already programmed are skipped. A day needed by every thermostat
+        of a room is sent as a single room message.
+        """
+        if target.is_room():
+            thermostats = [d for d in self.devices_by_room(target) if d.is_thermostat()]
+        else:
+            thermostats = [target]
+
+        uploads = []
+        for day, metadata in programme.items():
+            stale = [t for t in thermostats if not same_day(t.programme, day, metadata)]
+            if target.is_room() and stale and len(stale) == len(thermostats):
+                header = SET_ROOM_PROG_HEADER
+                uploads.append(self.__programme_upload(header, stale, day, metadata))
+            else:
+                header = SET_DEVICE_PROG_HEADER
+                for t in stale:
+                    uploads.append(self.__programme_upload(header, [t], day, metadata))
+        return uploads
+
+    def _apply_programme_upload(self, upload: ProgrammeUpload):
+        for thermostat in upload.devices:
+            thermostat.programme[upload.day] = list(upload.points)
+
+    def __programme_upload(self, header, devices, day, metadata) -> ProgrammeUpload:
+        payload = encode_day(tuple((x["temp"], x["until"]) for x in metadata))
+        command = bytearray(header)
         for device in devices:
-            command += device.rf_address
-            command += to_hex(device.room_id)
-            command += to_hex(n_from_day_of_week(day))
-            for heat, time in heat_time_tuples:
-                command += temp_and_time(heat, time)
-        return self.__commander.send_radio_msg(command)
+            command += device.rf_int.to_bytes(3, "big")
+            command += bytes((device.room_id, n_from_day_of_week(day)))
+            command += payload
+        return ProgrammeUpload(day, tuple(metadata), tuple(devices), bytes(command))
 
     def devices_as_json(self):
         devices = []
@@ -350,17 +500,6 @@ class MaxCube(MaxDevice):
             devices.append(device.to_dict())
         return json.dumps(devices, indent=2)
 
-    def set_programmes_from_config(self, config_file):
-        config = json.load(config_file)
-        for device_config in config:
-            device = self.device_by_rf(device_config["rf_address"])
-            programme = device_config["programme"]
-            if not programme:
-                # e.g. a wall thermostat
-                continue
-            for day, metadata in programme.items():
-                self.set_programme(device, day, metadata)
-
     @classmethod
     def resolve_device_mode(cls, bits):
         return bits & 3
@@ -371,30 +510,277 @@ class MaxCube(MaxDevice):
 
     @classmethod
     def parse_rf_address(cls, address):
-        return "".join("{:02X}".format(x) for x in address)
+        return bytes(address).hex().upper()
+
+
+class MaxCube(MaxCubeState):
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_PORT,
+        now: Callable[[], datetime] = datetime.now,
+        update_ttl: float = 0,
+    ):
+        super(MaxCube, self).__init__(now)
+        self.__commander = Commander(host, port)
+        self.__radio_scheduler: RadioScheduler = None
+        # Guards the cached state, which radio callbacks update from other threads
+        self.__state_lock = RLock()
+        self.update_ttl = update_ttl
+        self.__update_lock = Lock()
+        self.__update_in_flight: Future = None
+        self.__updated_at: float = None
+        self.update()
+        self.log()
+
+    @property
+    def use_persistent_connection(self) -> bool:
+        return self.__commander.use_persistent_connection
+
+    @use_persistent_connection.setter
+    def use_persistent_connection(self, value: bool) -> None:
+        self.__commander.use_persistent_connection = value
+
+    def disconnect(self):
+        self.__commander.disconnect()
+
+    def parse_messages(self, messages) -> List[MaxDeviceChange]:
+        with self.__state_lock:
+            return super(MaxCube, self).parse_messages(messages)
+
+    @property
+    def state_lock(self) -> RLock:
+        """Lock held while the state changes, to read several devices at once."""
+        return self.__state_lock
+
+    def _apply_temperature_mode(self, thermostat, temperature, mode):
+        with self.__state_lock:
+            super(MaxCube, self)._apply_temperature_mode(thermostat, temperature, mode)
+
+    def update(self) -> List[MaxDeviceChange]:
+        """Refresh the state and return the device changes it caused.
+
+        Concurrent callers share a single request to the cube. Within
+        update_ttl seconds of the last refresh the cached state is kept and
+        no changes are returned.
+        """
+        with self.__update_lock:
+            in_flight = self.__update_in_flight
+            if in_flight is None:
+                if self.__is_fresh():
+                    return []
+                self.__update_in_flight = Future()
+        if in_flight is not None:
+            return list(in_flight.result())
+
+        in_flight = self.__update_in_flight
+        try:
+            changes = self.parse_messages(self.__commander.update())
+            self.__updated_at = monotonic()
+            in_flight.set_result(changes)
+            return list(changes)
+        except BaseException as ex:
+            in_flight.set_exception(ex)
+            raise
+        finally:
+            with self.__update_lock:
+                self.__update_in_flight = None
+
+    def __is_fresh(self) -> bool:
+        return (
+            self.__updated_at is not None
+            and monotonic() - self.__updated_at < self.update_ttl
+        )
+
+    def listen(self) -> List[MaxDeviceChange]:
+        """Wait briefly for state pushed by the cube and apply it."""
+        return self.parse_messages(self.__commander.listen())
+
+    def set_target_temperature(self, thermostat, temperature):
+        return self.set_temperature_mode(thermostat, temperature, None)
+
+    def set_mode(self, thermostat, mode):
+        return self.set_temperature_mode(thermostat, None, mode)
+
+    def set_temperature_mode(self, thermostat, temperature, mode):
+        command = self._temperature_mode_command(thermostat, temperature, mode)
+        if command is None:
+            return
+        byte_cmd, temperature, mode = command
+        if self.__commander.send_radio_msg(byte_cmd):
+            self._apply_temperature_mode(thermostat, temperature, mode)
+            return True
+        return False
+
+    @property
+    def radio_scheduler(self) -> RadioScheduler:
+        if self.__radio_scheduler is None:
+            self.__radio_scheduler = RadioScheduler(self.__commander)
+        return self.__radio_scheduler
+
+    def submit_temperature_mode(self, thermostat, temperature, mode) -> Future:
+        """Queue a temperature/mode change on the radio scheduler.
+
+        The cached device state is updated once the cube accepts the message.
+        Cancelling the returned future drops the message if not sent yet.
+        """
+        command = self._temperature_mode_command(thermostat, temperature, mode)
+        if command is None:
+            return None
+        byte_cmd, temperature, mode = command
+        return self.radio_scheduler.submit(
+            byte_cmd,
+            on_accepted=lambda: self._apply_temperature_mode(
+                thermostat, temperature, mode
+            ),
+        )
+
+    def set_room_temperature(self, room, temperature):
+        return self.set_room_temperature_mode(room, temperature, None)
+
+    def set_room_mode(self, room, mode):
+        return self.set_room_temperature_mode(room, None, mode)
+
+    def set_room_temperature_mode(self, room, temperature, mode):
+        """Change all the thermostats of a room with a single radio message."""
+        command = self._room_temperature_mode_command(room, temperature, mode)
+        if command is None:
+            return
+        byte_cmd, members, temperature, mode = command
+        if self.__commander.send_radio_msg(byte_cmd):
+            for thermostat in members:
+                self._apply_temperature_mode(thermostat, temperature, mode)
+            return True
+        return False
+
+    def set_programme(self, thermostat, day, metadata):
+        command = self._programme_command(thermostat, day, metadata)
+        if command is None:
+            return
+        return self.__commander.send_radio_msg(command)
+
+    def set_programmes(self, thermostat, programme):
+        """Set the programme of several days, pipelining the radio messages."""
+        commands = self.__programme_commands(thermostat, programme)
+        return all(self.__commander.send_radio_msgs(commands))
+
+    def set_programmes_from_config(
+        self,
+        config_file,
+        journal: str = None,
+        on_progress: Callable[[int, ProgrammeUpload, bool], None] = None,
+        window: int = PROGRAMME_UPLOAD_WINDOW,
+    ) -> Dict[str, ProgrammeLoadResult]:
+        """Upload the programmes of a JSON device list, as from devices_as_json.
+
+        Devices are read from the list as their days are sent. Changed days
+        are queued on the radio scheduler, at most window at a time and taking
+        turns between devices, and on_progress(done, upload, accepted) is
+        called as the cube answers them. Days accepted are recorded in the
+        journal file, if any, so loading again skips them while the cube has
+        not caught up yet.
+        """
+        journal = ProgrammeJournal(journal) if journal else None
+        results = {}
+        try:
+            plans = self.__programme_load_plans(config_file, journal, results)
+            pending = interleave(plans, window)
+            queued = deque()
+            done = 0
+            while True:
+                for upload, previous in islice(pending, window - len(queued)):
+                    future = self.__submit_programme_upload(upload, previous, journal)
+                    queued.append((upload, future))
+                if not queued:
+                    return results
+                upload, future = queued.popleft()
+                accepted = self.__programme_upload_accepted(future)
+                result = results[upload.devices[0].rf_address]
+                (result.sent if accepted else result.failed).append(upload.day)
+                if not accepted:
+                    logger.warning(
+                        "Unable to set programme with command " + upload.command.hex()
+                    )
+                done += 1
+                if on_progress is not None:
+                    on_progress(done, upload, accepted)
+        finally:
+            if journal is not None:
+                journal.close()
+
+    def __programme_load_plans(self, config_file, journal, results):
+        for device_config in iter_json_array(config_file):
+            programme = device_config["programme"]
+            if not programme:
+                # e.g. a wall thermostat
+                continue
+            device = self.device_by_rf(device_config["rf_address"])
+            if device is None:
+                logger.warning(
+                    "Skipping programme of unknown device "
+                    + device_config["rf_address"]
+                )
+                continue
+            result = results[device.rf_address] = ProgrammeLoadResult(device.rf_address)
+            plan = []
+            for upload in self._plan_week_programme(device, programme):
+                previous = day_fingerprint(device.programme, upload.day)
+                if journal is None or not journal.covers(upload.command, previous):
+                    plan.append((upload, previous))
+            days = {upload.day for upload, _ in plan}
+            result.skipped.extend(day for day in programme if day not in days)
+            yield plan
+
+    def __submit_programme_upload(self, upload, previous, journal) -> Future:
+        def applied(future: Future):
+            if future.cancelled() or not future.result():
+                return
+            with self.__state_lock:
+                self._apply_programme_upload(upload)
+            if journal is not None:
+                rf_address = upload.devices[0].rf_address
+                journal.record(rf_address, upload.day, upload.command, previous)
+
+        future = self.radio_scheduler.submit(upload.command, PROGRAMME_UPLOAD_TIMEOUT)
+        future.add_done_callback(applied)
+        return future
+
+    def __programme_upload_accepted(self, future: Future) -> bool:
+        # The scheduler resolves the future once its deadline expires, give it
+        # time to finish the message in progress before giving up on it
+        timeout = PROGRAMME_UPLOAD_TIMEOUT.duration + RADIO_MSG_ATTEMPT_TIMEOUT.duration
+        try:
+            return not future.cancelled() and future.result(timeout)
+        except (CancelledError, FutureTimeoutError):
+            future.cancel()
+            return False
+
+    def set_week_programme(self, target, programme) -> bool:
+        """Upload the days of a programme that a thermostat or room lacks.
+
+        Days are compared ignoring padding, trailing 24:00 entries and
+        repeated temperatures, and the minimal set of radio messages is sent
+        through the pipeline. Accepted days are applied to the cached state.
+        """
+        uploads = self._plan_week_programme(target, programme)
+        results = self.__commander.send_radio_msgs([u.command for u in uploads])
+        with self.__state_lock:
+            for upload, result in zip(uploads, results):
+                if result:
+                    self._apply_programme_upload(upload)
+        return all(results)
+
+    def __programme_commands(self, thermostat, programme):
+        commands = []
+        for day, metadata in programme.items():
+            command = self._programme_command(thermostat, day, metadata)
+            if command is not None:
+                commands.append(command)
+        return commands
 
 
 def get_programme(bits):
-    n = 26
-    programme = {}
-    days = [bits[i : i + n] for i in range(0, len(bits), n)]
-    for j, day in enumerate(days):
-        n = 2
-        settings = [day[i : i + n] for i in range(0, len(day), n)]
-        day_programme = []
-        for setting in settings:
-            word = format(setting[0], "08b") + format(setting[1], "08b")
-            temp = int(int(word[:7], 2) / 2)
-            time_mins = int(word[7:], 2) * 5
-            mins = time_mins % 60
-            hours = int((time_mins - mins) / 60)
-            time = "{:02d}:{:02d}".format(hours, mins)
-            day_programme.append({"temp": temp, "until": time})
-            if time == "24:00":
-                # This appears to flag the end of usable set points
-                break
-        programme[day_of_week_from_n(j)] = day_programme
-    return programme
+    return WeeklyProgramme.decode(bits, DAYS)
 
 
 def n_from_day_of_week(day):
@@ -406,15 +792,7 @@ def day_of_week_from_n(day):
 
 
 def temp_and_time(temp, time):
-    temp = float(temp)
-    assert temp <= 32, "Temp must be 32 or lower"
-    assert temp % 0.5 == 0, "Temp must be increments of 0.5"
-    temp = int(temp * 2)
-    hours, mins = [int(x) for x in time.split(":")]
-    assert mins % 5 == 0, "Time must be a multiple of 5 mins"
-    mins = hours * 60 + mins
-    bits = format(temp, "07b") + format(int(mins / 5), "09b")
-    return to_hex(int(bits, 2))
+    return to_hex(encode_set_point(temp, time))
 
 
 def to_hex(value):
@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 from math import inf
 from time import time
@@ -37,3 +38,7 @@ class Deadline:
 
     def __str__(self) -> str:
         return "Deadline " + self.fullname()
+
+    async def wait_for(self, aw):
+        """Await aw, cancelling it when the deadline expires."""
+        return await asyncio.wait_for(aw, self.remaining(lower_bound=0.001))
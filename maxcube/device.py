@@ -1,4 +1,6 @@
-from typing import Tuple
+from dataclasses import dataclass
+from threading import RLock
+from typing import Any, Dict, Tuple
 
 MAX_CUBE = 0
 MAX_THERMOSTAT = 1
@@ -12,6 +14,10 @@ MAX_DEVICE_MODE_MANUAL = 1
 MAX_DEVICE_MODE_VACATION = 2
 MAX_DEVICE_MODE_BOOST = 3
 
+# Guards decoding configurations on first access, which is rare enough to
+# share one lock rather than give every device its own
+_CONFIG_LOCK = RLock()
+
 MAX_DEVICE_BATTERY_OK = 0
 MAX_DEVICE_BATTERY_LOW = 1
 
@@ -23,7 +29,71 @@ MODE_NAMES = {
 }
 
 
+# Keys of MaxDevice.to_dict, whatever the device type
+DICT_KEYS = (
+    "type",
+    "rf_address",
+    "room_id",
+    "name",
+    "serial",
+    "battery",
+    "comfort_temperature",
+    "eco_temperature",
+    "max_temperature",
+    "min_temperature",
+    "valve_position",
+    "target_temperature",
+    "actual_temperature",
+    "mode",
+    "programme",
+)
+
+
+def rf_address_to_hex(rf_int: int) -> str:
+    return f"{rf_int:06X}"
+
+
+def rf_address_to_int(rf_address) -> int:
+    if rf_address is None or isinstance(rf_address, int):
+        return rf_address
+    return int(rf_address, 16)
+
+
+def temperature_config(data: bytes) -> Dict[str, float]:
+    return {
+        "comfort_temperature": data[18] / 2.0,
+        "eco_temperature": data[19] / 2.0,
+        "max_temperature": data[20] / 2.0,
+        "min_temperature": data[21] / 2.0,
+    }
+
+
 class MaxDevice(object):
+    __slots__ = (
+        "type",
+        "__rf_int",
+        "__rf_address",
+        "room_id",
+        "name",
+        "serial",
+        "battery",
+        "programme",
+        "_config",
+        "config_decoded",
+    )
+    # State reported by to_dict, extended by each device type
+    FIELDS: Tuple[str, ...] = (
+        "type",
+        "rf_address",
+        "room_id",
+        "name",
+        "serial",
+        "battery",
+        "programme",
+    )
+    # Attributes decoded from the C message configuration, see decode_config
+    CONFIG_FIELDS: Tuple[str, ...] = ()
+
     def __init__(self):
         self.type = None
         self.rf_address = None
@@ -32,6 +102,62 @@ class MaxDevice(object):
         self.serial = None
         self.battery = None
         self.programme = None
+        self._config: str = None
+        self.config_decoded = False
+
+    def __getattr__(self, name):
+        # Only called for unset attributes, e.g. a configuration not decoded yet
+        if name not in self.CONFIG_FIELDS:
+            raise AttributeError(name)
+        with _CONFIG_LOCK:
+            if self._config is not None:
+                self.__decode_config()
+        return object.__getattribute__(self, name)
+
+    def set_config(self, config: str) -> None:
+        """Keep a base64 C message configuration, to decode on first access."""
+        with _CONFIG_LOCK:
+            for field in self.CONFIG_FIELDS:
+                try:
+                    delattr(self, field)
+                except AttributeError:
+                    pass
+            self._config = config
+
+    def decode_config(self, config: str) -> Dict[str, Any]:
+        return {}
+
+    def __decode_config(self):
+        # The configuration is only dropped once its fields are assigned, so
+        # that other threads never see them missing
+        for field, value in self.decode_config(self._config).items():
+            try:
+                # Values assigned since the configuration arrived take precedence
+                object.__getattribute__(self, field)
+            except AttributeError:
+                setattr(self, field, value)
+        self.config_decoded = True
+        self._config = None
+
+    @property
+    def rf_address(self) -> str:
+        if self.__rf_address is None and self.__rf_int is not None:
+            self.__rf_address = rf_address_to_hex(self.__rf_int)
+        return self.__rf_address
+
+    @rf_address.setter
+    def rf_address(self, value) -> None:
+        """Accept the hex string form or the 24 bit integer form."""
+        if value is None or isinstance(value, str):
+            self.__rf_int = None if value is None else int(value, 16)
+            self.__rf_address = value
+        else:
+            self.__rf_int = value
+            self.__rf_address = None
+
+    @property
+    def rf_int(self) -> int:
+        return self.__rf_int
 
     def is_thermostat(self):
         return self.type in (MAX_THERMOSTAT, MAX_THERMOSTAT_PLUS)
@@ -55,25 +181,21 @@ class MaxDevice(object):
         return self.describe(str(self.type))
 
     def to_dict(self):
-        data = {}
-        keys = [
-            "type",
-            "rf_address",
-            "room_id",
-            "name",
-            "serial",
-            "battery",
-            "comfort_temperature",
-            "eco_temperature",
-            "max_temperature",
-            "min_temperature",
-            "valve_position",
-            "target_temperature",
-            "actual_temperature",
-            "mode",
-            "programme",
-        ]
-        for key in keys:
-            data[key] = getattr(self, key, None)
-        data["rf_address"] = self.rf_address
+        data = dict.fromkeys(DICT_KEYS)
+        for key in self.FIELDS:
+            data[key] = getattr(self, key)
+        if data["programme"] is not None:
+            data["programme"] = dict(data["programme"])
         return data
+
+
+@dataclass(frozen=True)
+class MaxDeviceChange:
+    device: MaxDevice
+    field: str
+    old: Any
+    new: Any
+
+    @property
+    def rf_address(self) -> str:
+        return self.device.rf_address
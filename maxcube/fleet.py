@@ -0,0 +1,125 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+from time import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .commander import Commander
+from .cube import DEFAULT_PORT, MaxCubeState
+from .deadline import Deadline, Timeout
+from .device import MaxDevice
+from .room import MaxRoom
+
+logger = logging.getLogger(__name__)
+
+FLEET_POLL_TIMEOUT = Timeout("fleet-poll", 5.0)
+
+
+@dataclass(frozen=True)
+class CubeStatus:
+    host: str
+    port: int
+    serial: Optional[str]
+    ok: bool
+    latency: Optional[float] = None
+    error: Optional[str] = None
+
+
+class _FleetMember(object):
+    def __init__(self, host: str, port: int, now: Callable[[], datetime]):
+        self.host = host
+        self.port = port
+        self.commander = Commander(host, port)
+        self.state = MaxCubeState(now)
+        self.future: Future = None
+
+    def poll(self) -> Tuple[list, float]:
+        start = time()
+        messages = self.commander.update()
+        return messages, time() - start
+
+    def status(self, ok: bool, latency=None, error=None) -> CubeStatus:
+        return CubeStatus(
+            self.host, self.port, self.state.serial, ok, latency=latency, error=error
+        )
+
+
+class MaxCubeFleet(object):
+    """Polls many cubes concurrently.
+
+    Every cube is updated on a worker thread and poll() only waits for them up
+    to the fleet deadline, so an unreachable cube is reported as failed instead
+    of delaying the rest. A cube still busy with a previous poll is not polled
+    again until it finishes.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[Union[str, Tuple[str, int]]],
+        timeout: Timeout = FLEET_POLL_TIMEOUT,
+        max_workers: int = None,
+        now: Callable[[], datetime] = datetime.now,
+    ):
+        self.__members: List[_FleetMember] = []
+        for host in hosts:
+            host, port = (host, DEFAULT_PORT) if isinstance(host, str) else host
+            self.__members.append(_FleetMember(host, port, now))
+        self.__timeout = timeout
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(1, len(self.__members)),
+            thread_name_prefix="maxcube-fleet",
+        )
+        self.statuses: Dict[str, CubeStatus] = {}
+
+    @property
+    def cubes(self) -> Dict[str, MaxCubeState]:
+        return {m.state.serial: m.state for m in self.__members if m.state.serial}
+
+    @property
+    def devices(self) -> Dict[str, List[MaxDevice]]:
+        return {serial: cube.devices for serial, cube in self.cubes.items()}
+
+    @property
+    def rooms(self) -> Dict[str, List[MaxRoom]]:
+        return {serial: cube.rooms for serial, cube in self.cubes.items()}
+
+    def poll(self) -> Dict[str, CubeStatus]:
+        deadline = Deadline(self.__timeout)
+        pending = []
+        statuses = {}
+        for member in self.__members:
+            if member.future is not None and not member.future.done():
+                statuses[member.host] = member.status(False, error="busy")
+                continue
+            if member.future is not None:
+                # Late result of a poll that missed the previous deadline
+                self.__collect(member)
+            member.future = self.__executor.submit(member.poll)
+            pending.append(member)
+
+        wait([m.future for m in pending], timeout=deadline.remaining())
+
+        for member in pending:
+            if member.future.done():
+                statuses[member.host] = self.__collect(member)
+            else:
+                logger.warning(f"Max! Cube {member.host} missed {deadline}")
+                statuses[member.host] = member.status(False, error=str(deadline))
+        self.statuses = statuses
+        return statuses
+
+    def close(self):
+        for member in self.__members:
+            member.commander.disconnect()
+        self.__executor.shutdown(wait=False)
+
+    def __collect(self, member: _FleetMember) -> CubeStatus:
+        future, member.future = member.future, None
+        try:
+            messages, latency = future.result()
+        except Exception as ex:
+            logger.warning(f"Unable to update Max! Cube {member.host}: {ex}")
+            return member.status(False, error=str(ex))
+        member.state.parse_messages(messages)
+        return member.status(True, latency=latency)
@@ -0,0 +1,88 @@
+import logging
+from queue import Queue
+from threading import Event, Lock, Thread
+from typing import Callable, Iterator, List
+
+from .device import MaxDeviceChange
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 5.0
+_STOP = object()
+
+
+class MaxCubeListener(object):
+    """Reads the state pushed by the cube and emits device change events.
+
+    A background thread keeps the cube connection open and applies every
+    message pushed by the cube as soon as it arrives. The resulting changes
+    are passed to the registered callbacks and to every events() iterator.
+    """
+
+    def __init__(self, cube, retry_delay: float = RETRY_DELAY):
+        self.__cube = cube
+        self.__retry_delay = retry_delay
+        self.__callbacks: List[Callable[[MaxDeviceChange], None]] = []
+        self.__queues: List[Queue] = []
+        self.__lock = Lock()
+        self.__stopped = Event()
+        self.__thread: Thread = None
+
+    def add_callback(self, callback: Callable[[MaxDeviceChange], None]):
+        with self.__lock:
+            self.__callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[MaxDeviceChange], None]):
+        with self.__lock:
+            self.__callbacks.remove(callback)
+
+    def start(self):
+        self.__stopped.clear()
+        self.__thread = Thread(target=self.__run, name="maxcube-listener", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        with self.__lock:
+            for queue in self.__queues:
+                queue.put(_STOP)
+
+    def events(self) -> Iterator[MaxDeviceChange]:
+        """Iterate over the device changes until the listener is stopped."""
+        queue = Queue()
+        with self.__lock:
+            self.__queues.append(queue)
+        try:
+            while True:
+                change = queue.get()
+                if change is _STOP:
+                    return
+                yield change
+        finally:
+            with self.__lock:
+                self.__queues.remove(queue)
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            try:
+                changes = self.__cube.listen()
+            except Exception as ex:
+                logger.warning(f"Error listening to Max! Cube: {ex}")
+                self.__stopped.wait(self.__retry_delay)
+                continue
+            for change in changes:
+                self.__emit(change)
+
+    def __emit(self, change: MaxDeviceChange):
+        with self.__lock:
+            callbacks = list(self.__callbacks)
+            for queue in self.__queues:
+                queue.put(change)
+        for callback in callbacks:
+            try:
+                callback(change)
+            except Exception:
+                logger.warning(f"Error handling {change}", exc_info=True)
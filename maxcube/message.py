@@ -16,6 +16,7 @@ class Message:
         return (f"{self.cmd}:{self.arg}\r\n").encode("utf-8")
 
     @staticmethod
-    def decode(line: bytes) -> "Message":
-        comps = line.decode("utf-8").strip().split(":", 1)
-        return Message(comps[0], comps[1] if len(comps) > 1 else "")
+    def decode(line) -> "Message":
+        """Decode a line from any bytes-like object, e.g. a memoryview slice."""
+        cmd, _, arg = str(line, "utf-8").strip().partition(":")
+        return Message(cmd, arg)
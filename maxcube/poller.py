@@ -0,0 +1,151 @@
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+import logging
+from threading import Event, Thread
+from time import time
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional, Tuple
+
+from .device import MaxDeviceChange
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60.0
+
+
+@dataclass(frozen=True)
+class DeviceSnapshot:
+    type: int
+    rf_address: str
+    room_id: int
+    name: str
+    serial: str
+    battery: Optional[int] = None
+    mode: Optional[int] = None
+    comfort_temperature: Optional[float] = None
+    eco_temperature: Optional[float] = None
+    max_temperature: Optional[float] = None
+    min_temperature: Optional[float] = None
+    valve_position: Optional[int] = None
+    target_temperature: Optional[float] = None
+    actual_temperature: Optional[float] = None
+    is_open: Optional[bool] = None
+    programme: Optional[Mapping[str, Tuple[Mapping[str, Any], ...]]] = None
+
+
+@dataclass(frozen=True)
+class RoomSnapshot:
+    id: int
+    name: str
+    devices: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class CubeSnapshot:
+    serial: str
+    rf_address: str
+    firmware_version: str
+    rooms: Tuple[RoomSnapshot, ...]
+    devices: Tuple[DeviceSnapshot, ...]
+    timestamp: float
+    _devices_by_rf: Mapping[str, DeviceSnapshot] = field(
+        init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        index = MappingProxyType({d.rf_address: d for d in self.devices})
+        object.__setattr__(self, "_devices_by_rf", index)
+
+    def device_by_rf(self, rf: str) -> Optional[DeviceSnapshot]:
+        return self._devices_by_rf.get(rf)
+
+    def devices_by_room(self, room: RoomSnapshot) -> List[DeviceSnapshot]:
+        return [self._devices_by_rf[rf] for rf in room.devices]
+
+
+def take_snapshot(cube) -> CubeSnapshot:
+    """Copy the current cube state into immutable objects.
+
+    The state lock of the cube, if it has one, is held while copying so that
+    changes applied from other threads are never half seen.
+    """
+    with getattr(cube, "state_lock", None) or nullcontext():
+        devices = tuple(_device_snapshot(device) for device in cube.devices)
+        rooms = tuple(
+            RoomSnapshot(
+                room.id,
+                room.name,
+                tuple(d.rf_address for d in cube.devices_by_room(room)),
+            )
+            for room in cube.rooms
+        )
+    return CubeSnapshot(
+        cube.serial, cube.rf_address, cube.firmware_version, rooms, devices, time()
+    )
+
+
+def _device_snapshot(device) -> DeviceSnapshot:
+    values = device.to_dict()
+    values["is_open"] = getattr(device, "is_open", None)
+    programme = values.get("programme")
+    if programme:
+        values["programme"] = MappingProxyType(
+            {
+                day: tuple(MappingProxyType(dict(point)) for point in points)
+                for day, points in programme.items()
+            }
+        )
+    else:
+        values["programme"] = None
+    return DeviceSnapshot(**values)
+
+
+class MaxCubePoller(object):
+    """Updates a cube on a background thread and publishes snapshots of it.
+
+    Only the poller thread touches the cube. Readers use the snapshot
+    attribute, which is replaced as a whole after every successful update, so
+    they always see a consistent state without waiting for the cube.
+    """
+
+    def __init__(
+        self,
+        cube,
+        interval: float = DEFAULT_INTERVAL,
+        on_update: Callable[[CubeSnapshot, List[MaxDeviceChange]], None] = None,
+    ):
+        self.__cube = cube
+        self.__interval = interval
+        self.__on_update = on_update
+        self.__stopped = Event()
+        self.__thread: Thread = None
+        self.snapshot: CubeSnapshot = take_snapshot(cube)
+        self.last_error: Optional[Exception] = None
+
+    def start(self):
+        self.__stopped.clear()
+        self.__thread = Thread(target=self.__run, name="maxcube-poller", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __run(self):
+        while not self.__stopped.wait(self.__interval):
+            self.poll()
+
+    def poll(self) -> CubeSnapshot:
+        try:
+            changes = self.__cube.update()
+        except Exception as ex:
+            logger.warning(f"Error polling Max! Cube: {ex}")
+            self.last_error = ex
+            return self.snapshot
+        self.last_error = None
+        self.snapshot = take_snapshot(self.__cube)
+        if self.__on_update is not None:
+            self.__on_update(self.snapshot, changes)
+        return self.snapshot
@@ -0,0 +1,225 @@
+from array import array
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# A set point word holds the temperature in half degrees in its upper 7 bits
+# and the end of the period in 5 minute steps in its lower 9 bits.
+TIME_BITS = 9
+TIME_MASK = (1 << TIME_BITS) - 1
+END_OF_DAY = 24 * 60 // 5
+DAY_LENGTH = 26
+SLOTS_PER_DAY = END_OF_DAY
+SLOT_TIMES = [
+    f"{slot * 5 // 60:02}:{slot * 5 % 60:02}" for slot in range(SLOTS_PER_DAY)
+]
+PROG_DAYS = [
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
+DAYS = [
+    "saturday",
+    "sunday",
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
+
+
+def decode_set_point(word: int) -> Dict[str, object]:
+    hours, mins = divmod((word & TIME_MASK) * 5, 60)
+    half_degrees = word >> TIME_BITS
+    # Whole degrees stay ints, as written by earlier versions
+    temp = half_degrees // 2 if half_degrees % 2 == 0 else half_degrees / 2
+    return {"temp": temp, "until": f"{hours:02d}:{mins:02d}"}
+
+
+def encode_set_point(temp, time: str) -> int:
+    temp = float(temp)
+    assert temp <= 32, "Temp must be 32 or lower"
+    assert temp % 0.5 == 0, "Temp must be increments of 0.5"
+    hours, mins = [int(x) for x in time.split(":")]
+    assert mins % 5 == 0, "Time must be a multiple of 5 mins"
+    return (int(temp * 2) << TIME_BITS) | ((hours * 60 + mins) // 5)
+
+
+@lru_cache(maxsize=512)
+def encode_day(set_points: Tuple[Tuple[object, str], ...]) -> bytes:
+    """Encode the (temp, until) set points of a day for a programme command.
+
+    The result is cached, as the same day is often sent to many devices.
+    """
+    payload = bytearray()
+    for temp, time in set_points:
+        payload += encode_set_point(temp, time).to_bytes(2, "big")
+    # Up to seven set points are sent, unused ones as a single zero byte
+    payload += bytes(max(0, 7 - len(set_points)))
+    return bytes(payload)
+
+
+def normalize_day(words: Iterable[int]) -> Tuple[int, ...]:
+    """Return the canonical form of the set point words of a day.
+
+    Padding is dropped, the day ends with the first set point until 24:00
+    and consecutive set points with the same temperature are merged.
+    """
+    result = []
+    for word in words:
+        if word == 0:
+            continue
+        if result and result[-1] >> TIME_BITS == word >> TIME_BITS:
+            result[-1] = word
+        else:
+            result.append(word)
+        if word & TIME_MASK == END_OF_DAY:
+            break
+    return tuple(result)
+
+
+def day_words(programme, day: str) -> Iterable[int]:
+    """Return the set point words of a day of any programme mapping."""
+    if isinstance(programme, WeeklyProgramme):
+        return programme.words(day) if day in programme else ()
+    points = (programme or {}).get(day) or ()
+    return (encode_set_point(p["temp"], p["until"]) for p in points)
+
+
+def same_day(programme, day: str, points: List[Dict[str, Any]]) -> bool:
+    """Tell whether a programme already holds the set points for a day."""
+    return normalize_day(day_words(programme, day)) == normalize_day(
+        day_words({day: points}, day)
+    )
+
+
+def day_fingerprint(programme, day: str) -> str:
+    """Return the normalized set points of a day in hex."""
+    return "".join(f"{word:04x}" for word in normalize_day(day_words(programme, day)))
+
+
+@dataclass(frozen=True)
+class ProgrammeUpload:
+    """A radio message programming a day on one or more thermostats."""
+
+    day: str
+    points: Tuple[Dict[str, Any], ...]
+    devices: Tuple[Any, ...]
+    command: bytes
+
+
+def decode_day(data) -> array:
+    """Read the set point words of a day, up to the one ending at 24:00."""
+    words = array("H")
+    for pos in range(0, len(data) - 1, 2):
+        word = (data[pos] << 8) | data[pos + 1]
+        words.append(word)
+        if word & TIME_MASK == END_OF_DAY:
+            # This appears to flag the end of usable set points
+            break
+    return words
+
+
+class WeeklyProgramme(MutableMapping):
+    """Weekly programme of a thermostat, by day name.
+
+    Days are stored as the raw set point words received from the cube. The
+    list of {"temp", "until"} dicts of a day is only built when it is read.
+    Changes must be made by assigning days: the lookup table behind
+    temperature_at does not see changes made to a day's list in place.
+    """
+
+    def __init__(self, words: Dict[str, array] = None):
+        self.__words: Dict[str, array] = dict(words or {})
+        self.__days: Dict[str, List[Dict[str, object]]] = dict.fromkeys(self.__words)
+        self.__slots: list = None
+
+    @classmethod
+    def decode(cls, data, day_names: List[str]) -> "WeeklyProgramme":
+        return cls(
+            {
+                day_names[j]: decode_day(data[pos : pos + DAY_LENGTH])
+                for j, pos in enumerate(range(0, len(data), DAY_LENGTH))
+            }
+        )
+
+    def words(self, day: str) -> array:
+        """Return the raw set point words of a day."""
+        words = self.__words.get(day)
+        if words is None:
+            words = array(
+                "H", (encode_set_point(p["temp"], p["until"]) for p in self[day])
+            )
+        return words
+
+    def temperature_at(self, dt: datetime):
+        """Return the programmed temperature at dt, in 5 minute resolution."""
+        if self.__slots is None:
+            self.__slots = self.__build_slots()
+        slot = (dt.hour * 60 + dt.minute) // 5
+        return self.__slots[dt.weekday() * SLOTS_PER_DAY + slot]
+
+    def __build_slots(self) -> list:
+        slots = []
+        for day in PROG_DAYS:
+            points = list(self.__set_points(day))
+            for time in SLOT_TIMES:
+                slots.append(next((t for t, until in points if time < until), None))
+        return slots
+
+    def __set_points(self, day: str) -> Iterator[Tuple[object, str]]:
+        points = self.__days.get(day)
+        if points is not None:
+            return ((p["temp"], p["until"]) for p in points)
+        points = map(decode_set_point, self.__words.get(day, ()))
+        return ((p["temp"], p["until"]) for p in points)
+
+    def __getitem__(self, day: str) -> List[Dict[str, object]]:
+        points = self.__days[day]
+        if points is None:
+            points = [decode_set_point(word) for word in self.__words[day]]
+            self.__days[day] = points
+        return points
+
+    def __setitem__(self, day: str, points: List[Dict[str, object]]):
+        self.__days[day] = points
+        self.__words.pop(day, None)
+        self.__slots = None
+
+    def __delitem__(self, day: str):
+        del self.__days[day]
+        self.__words.pop(day, None)
+        self.__slots = None
+
+    def __iter__(self):
+        return iter(self.__days)
+
+    def __len__(self) -> int:
+        return len(self.__days)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, WeeklyProgramme):
+            words, other_words = self.__raw_words(), other.__raw_words()
+            if words is not None and other_words is not None:
+                return words == other_words
+        if isinstance(other, Mapping):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __raw_words(self):
+        # Decoded days may have been modified in place
+        if any(points is not None for points in self.__days.values()):
+            return None
+        return self.__words
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
@@ -0,0 +1,152 @@
+"""Share a single Max! Cube connection between several local clients.
+
+The cube only accepts one TCP client at a time. The proxy keeps a persistent
+connection to it and speaks the same line protocol to any number of clients:
+the connection handshake and l: requests are answered from cached state, and
+s: radio messages are forwarded to the cube one at a time. Other requests are
+answered with an E: error reply, as their replies could not be told apart
+from the ones pushed by the cube.
+"""
+import argparse
+import logging
+import socketserver
+from threading import RLock
+from time import time
+from typing import Dict, List
+
+from .commander import SEND_RADIO_MSG_TIMEOUT, Commander
+from .cube import DEFAULT_PORT
+from .message import Message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 60.0
+RADIO_MSG_FAILED = Message("S", "00,1,00")
+UNSUPPORTED_REQUEST = Message("E", "unsupported")
+
+
+class MaxCubeProxy(object):
+    def __init__(self, host: str, port: int = DEFAULT_PORT, max_age=DEFAULT_MAX_AGE):
+        self.__commander = Commander(host, port)
+        self.__lock = RLock()
+        self.__max_age = max_age
+        self.__hello: Message = None
+        self.__metadata: List[Message] = []
+        self.__configs: Dict[str, Message] = {}
+        self.__state: Message = None
+        self.__last_update = 0.0
+
+    def handshake(self) -> List[Message]:
+        with self.__lock:
+            if self.__hello is None or self.__is_stale():
+                self.refresh()
+            result = [self.__hello] + self.__metadata + list(self.__configs.values())
+            if self.__state:
+                result.append(self.__state)
+            return [msg for msg in result if msg is not None]
+
+    def state(self) -> Message:
+        with self.__lock:
+            if self.__state is None or self.__is_stale():
+                self.refresh()
+            return self.__state
+
+    def forward(self, msg: Message) -> Message:
+        if msg.cmd != "s":
+            logger.warning(f"Not forwarding unsupported request {msg}")
+            return UNSUPPORTED_REQUEST
+        with self.__lock:
+            try:
+                reply = self.__commander.call(msg, SEND_RADIO_MSG_TIMEOUT)
+            except Exception as ex:
+                logger.error(f"Unable to forward {msg} to Max! Cube: {ex}")
+                return RADIO_MSG_FAILED
+            # The command most likely changed some device state
+            self.__last_update = 0.0
+            return reply
+
+    def refresh(self):
+        with self.__lock:
+            for msg in self.__commander.update():
+                self.__cache(msg)
+            self.__last_update = time()
+
+    def close(self):
+        with self.__lock:
+            self.__commander.disconnect()
+
+    def __is_stale(self) -> bool:
+        return time() - self.__last_update > self.__max_age
+
+    def __cache(self, msg: Message):
+        if msg.cmd == "H":
+            self.__hello = msg
+        elif msg.cmd == "M":
+            if msg.arg.startswith("00,"):
+                self.__metadata = []
+            self.__metadata.append(msg)
+        elif msg.cmd == "C":
+            self.__configs[msg.arg.split(",", 1)[0].lower()] = msg
+        elif msg.cmd == "L":
+            self.__state = msg
+
+
+class MaxCubeProxyHandler(socketserver.StreamRequestHandler):
+    server: "MaxCubeProxyServer"
+
+    def handle(self):
+        proxy = self.server.proxy
+        try:
+            self.__send(*proxy.handshake())
+        except Exception as ex:
+            logger.error(f"Unable to connect to Max! Cube: {ex}")
+            return
+
+        for line in self.rfile:
+            request = Message.decode(line)
+            logger.debug(f"{self.client_address} sent: {request}")
+            if request.cmd == "q":
+                break
+            elif request.cmd == "l":
+                reply = proxy.state()
+            else:
+                reply = proxy.forward(request)
+            if reply is not None:
+                self.__send(reply)
+
+    def __send(self, *messages: Message):
+        self.wfile.write(b"".join(msg.encode() for msg in messages))
+
+
+class MaxCubeProxyServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, proxy: MaxCubeProxy):
+        super(MaxCubeProxyServer, self).__init__(address, MaxCubeProxyHandler)
+        self.proxy = proxy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Share a Max! Cube connection")
+    parser.add_argument("--host", required=True)
+    parser.add_argument("--port", default=DEFAULT_PORT, type=int)
+    parser.add_argument("--listen-host", default="127.0.0.1")
+    parser.add_argument("--listen-port", default=DEFAULT_PORT, type=int)
+    parser.add_argument("--max-age", default=DEFAULT_MAX_AGE, type=float)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    proxy = MaxCubeProxy(args.host, args.port, max_age=args.max_age)
+    server = MaxCubeProxyServer((args.listen_host, args.listen_port), proxy)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        proxy.close()
+
+
+if __name__ == "__main__":
+    main()
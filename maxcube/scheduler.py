@@ -0,0 +1,196 @@
+from collections import deque
+from concurrent.futures import Future
+import logging
+from threading import Condition, Thread
+from time import time
+from typing import Callable, Union
+
+from .commander import SEND_RADIO_MSG_TIMEOUT, Commander, RadioStatus
+from .deadline import Deadline, Timeout
+
+logger = logging.getLogger(__name__)
+
+# The cube reports its duty cycle as a percentage of the 1% airtime it may use
+# per hour, so every reported point takes about 36 seconds to recover.
+DUTY_CYCLE_RECOVERY = 36.0
+DUTY_CYCLE_LIMIT = 80
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+
+
+class _RadioCommand(object):
+    def __init__(
+        self,
+        radio_msg: Union[str, bytes],
+        timeout: Timeout,
+        on_accepted: Callable[[], None] = None,
+    ):
+        self.radio_msg = radio_msg
+        self.on_accepted = on_accepted
+        self.deadline = Deadline(timeout)
+        self.future = Future()
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class RadioScheduler(object):
+    """Queue of radio messages paced by the duty cycle reported by the cube.
+
+    Messages are sent in submission order from a background thread, which
+    stays under duty_cycle_limit percent of the airtime budget and backs off
+    exponentially when the cube rejects a message. submit() returns a future
+    resolved with True once the message is accepted, or False if its timeout
+    expires first.
+    """
+
+    def __init__(
+        self,
+        commander: Commander,
+        duty_cycle_limit: int = DUTY_CYCLE_LIMIT,
+        timeout: Timeout = SEND_RADIO_MSG_TIMEOUT,
+        min_backoff: float = MIN_BACKOFF,
+        max_backoff: float = MAX_BACKOFF,
+    ):
+        self.__commander = commander
+        self.__duty_cycle_limit = duty_cycle_limit
+        self.__timeout = timeout
+        self.__min_backoff = min_backoff
+        self.__max_backoff = max_backoff
+        self.__queue = deque()
+        self.__condition = Condition()
+        self.__thread: Thread = None
+        self.__closed = False
+        self.__paced_until = 0.0
+        self.status: RadioStatus = None
+
+    def submit(
+        self,
+        radio_msg: Union[str, bytes],
+        timeout: Timeout = None,
+        on_accepted: Callable[[], None] = None,
+    ) -> Future:
+        """Queue a radio message.
+
+        on_accepted is called from the radio thread once the cube accepts the
+        message, before the future is resolved.
+        """
+        command = _RadioCommand(radio_msg, timeout or self.__timeout, on_accepted)
+        with self.__condition:
+            if self.__closed:
+                raise RuntimeError("Radio scheduler is closed")
+            self.__queue.append(command)
+            if self.__thread is None:
+                self.__thread = Thread(
+                    target=self.__run, name="maxcube-radio", daemon=True
+                )
+                self.__thread.start()
+            self.__condition.notify()
+        return command.future
+
+    def pending(self) -> int:
+        with self.__condition:
+            return len(self.__queue)
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            while self.__queue:
+                command = self.__queue.popleft()
+                if not command.future.cancel():
+                    # Already sent once, waiting for a retry
+                    self.__resolve(command, False)
+            self.__condition.notify()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                command = self.__next_command()
+                if command is None:
+                    # Closed while a message sent last was queued for retry
+                    while self.__queue:
+                        self.__resolve(self.__queue.popleft(), False)
+                    return
+            try:
+                self.__send(command)
+            except Exception:
+                # Keep serving the queue, or every later future would hang
+                logger.exception("Error in radio scheduler")
+                self.__resolve(command, False)
+
+    def __next_command(self) -> _RadioCommand:
+        while not self.__closed:
+            if not self.__queue:
+                self.__condition.wait()
+                continue
+            command = self.__queue[0]
+            delay = max(command.not_before, self.__paced_until) - time()
+            if delay <= 0:
+                return self.__queue.popleft()
+            if command.deadline.remaining() <= delay:
+                self.__queue.popleft()
+                self.__expire(command)
+                continue
+            self.__condition.wait(delay)
+        return None
+
+    def __send(self, command: _RadioCommand):
+        if not self.__claim(command):
+            return
+        if command.deadline.is_expired():
+            self.__expire(command)
+            return
+        command.attempts += 1
+        try:
+            status = self.__commander.try_send_radio_msg(command.radio_msg)
+        except Exception as ex:
+            logger.error("Error sending radio message to Max! Cube: " + str(ex))
+            status = None
+        if status is not None:
+            self.status = status
+            self.__pace(status)
+            if status.accepted:
+                if command.on_accepted is not None:
+                    command.on_accepted()
+                self.__resolve(command, True)
+                return
+        backoff = min(
+            self.__min_backoff * 2 ** (command.attempts - 1), self.__max_backoff
+        )
+        command.not_before = time() + backoff
+        with self.__condition:
+            # Retry before anything else to preserve submission order
+            self.__queue.appendleft(command)
+
+    def __expire(self, command: _RadioCommand):
+        if not self.__claim(command):
+            return
+        radio_msg = command.radio_msg
+        if isinstance(radio_msg, bytes):
+            radio_msg = radio_msg.hex()
+        logger.error(
+            f"Radio message {radio_msg} not sent after {command.attempts} attempts"
+        )
+        self.__resolve(command, False)
+
+    def __claim(self, command: _RadioCommand) -> bool:
+        # Futures cancelled by their callers are dropped, the others can no
+        # longer be cancelled once they are first sent or expired
+        future = command.future
+        return future.running() or future.set_running_or_notify_cancel()
+
+    def __resolve(self, command: _RadioCommand, result: bool):
+        if self.__claim(command) and not command.future.done():
+            command.future.set_result(result)
+
+    def __pace(self, status: RadioStatus):
+        excess = status.duty_cycle - self.__duty_cycle_limit + 1
+        if excess > 0 or status.free_slots == 0:
+            self.__paced_until = time() + max(excess, 1) * DUTY_CYCLE_RECOVERY
+            logger.debug(
+                f"Duty cycle at {status.duty_cycle}%, pausing radio messages "
+                f"for {self.__paced_until - time():.0f}s"
+            )
+        else:
+            self.__paced_until = 0.0
@@ -1,20 +1,31 @@
+import base64
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, Dict, Iterable, List
 
-from maxcube.device import MODE_NAMES, MaxDevice
-
-PROG_DAYS = [
-    "monday",
-    "tuesday",
-    "wednesday",
-    "thursday",
-    "friday",
-    "saturday",
-    "sunday",
-]
+from maxcube.device import MODE_NAMES, MaxDevice, temperature_config
+from maxcube.programme import DAYS, PROG_DAYS, WeeklyProgramme
 
 
 class MaxThermostat(MaxDevice):
+    __slots__ = (
+        "comfort_temperature",
+        "eco_temperature",
+        "max_temperature",
+        "min_temperature",
+        "valve_position",
+        "target_temperature",
+        "actual_temperature",
+        "mode",
+    )
+    FIELDS = MaxDevice.FIELDS + __slots__
+    CONFIG_FIELDS = (
+        "comfort_temperature",
+        "eco_temperature",
+        "max_temperature",
+        "min_temperature",
+        "programme",
+    )
+
     def __init__(self):
         super(MaxThermostat, self).__init__()
         self.comfort_temperature = None
@@ -39,15 +50,28 @@ class MaxThermostat(MaxDevice):
             f"valve={self.valve_position}",
         )
 
+    def decode_config(self, config: str) -> Dict[str, Any]:
+        data = base64.b64decode(config)
+        values = temperature_config(data)
+        values["programme"] = WeeklyProgramme.decode(data[29:], DAYS)
+        return values
+
     def get_programmed_temp_at(self, dt: datetime):
         """Retrieve the programmed temperature at the given instant."""
+        programme = self.programme
+        if isinstance(programme, WeeklyProgramme):
+            return programme.temperature_at(dt)
         weekday = PROG_DAYS[dt.weekday()]
         time = f"{dt.hour:02}:{dt.minute:02}"
-        for point in self.programme.get(weekday, []):
+        for point in programme.get(weekday, []):
             if time < point["until"]:
                 return point["temp"]
         return None
 
+    def get_programmed_temps_at(self, dts: Iterable[datetime]) -> List:
+        """Retrieve the programmed temperatures at several instants."""
+        return [self.get_programmed_temp_at(dt) for dt in dts]
+
     def get_current_temp_in_auto_mode(self):
         """DEPRECATED: use get_programmed_temp_at instead."""
         return self.get_programmed_temp_at(datetime.now())
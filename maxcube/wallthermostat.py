@@ -1,7 +1,27 @@
-from maxcube.device import MODE_NAMES, MaxDevice
+import base64
+from typing import Any, Dict
+
+from maxcube.device import MODE_NAMES, MaxDevice, temperature_config
 
 
 class MaxWallThermostat(MaxDevice):
+    __slots__ = (
+        "comfort_temperature",
+        "eco_temperature",
+        "max_temperature",
+        "min_temperature",
+        "actual_temperature",
+        "target_temperature",
+        "mode",
+    )
+    FIELDS = MaxDevice.FIELDS + __slots__
+    CONFIG_FIELDS = (
+        "comfort_temperature",
+        "eco_temperature",
+        "max_temperature",
+        "min_temperature",
+    )
+
     def __init__(self):
         super(MaxWallThermostat, self).__init__()
         self.comfort_temperature = None
@@ -12,6 +32,9 @@ class MaxWallThermostat(MaxDevice):
         self.target_temperature = None
         self.mode = None
 
+    def decode_config(self, config: str) -> Dict[str, Any]:
+        return temperature_config(base64.b64decode(config))
+
     def __str__(self):
         return self.describe(
             "WALLTHERMO",
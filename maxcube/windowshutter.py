@@ -1,11 +1,23 @@
+import base64
+from typing import Any, Dict
+
 from maxcube.device import MaxDevice
 
 
 class MaxWindowShutter(MaxDevice):
+    __slots__ = ("is_open", "initialized")
+    CONFIG_FIELDS = ("initialized",)
+
     def __init__(self):
         super(MaxWindowShutter, self).__init__()
         self.is_open = False
         self.initialized = None
 
+    def decode_config(self, config: str) -> Dict[str, Any]:
+        # Pure Speculation based on this:
+        # Before: [17][12][162][178][4][0][20][15]KEQ0839778
+        # After:  [17][12][162][178][4][1][20][15]KEQ0839778
+        return {"initialized": base64.b64decode(config)[5]}
+
     def __str__(self):
         return self.describe("WINDOW", f"open={self.is_open}")
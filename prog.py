@@ -3,14 +3,36 @@ import sys
 
 from maxcube.cube import DEFAULT_PORT, MaxCube
 
+
+def print_progress(done, upload, accepted):
+    status = "ok" if accepted else "FAILED"
+    rf_address = upload.devices[0].rf_address
+    print(f"[{done}] {rf_address} {upload.day}: {status}", file=sys.stderr)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Set or dump thermostat programmes")
     parser.add_argument("--host", required=True)
     parser.add_argument("--port", default=DEFAULT_PORT, type=int)
+    parser.add_argument(
+        "--journal",
+        help="file recording the days sent, so an interrupted load can be resumed",
+    )
     parser.add_argument("cmd", choices=["load", "dump"])
     args = parser.parse_args()
     cube = MaxCube(args.host, args.port)
     if args.cmd == "load":
-        cube.set_programmes_from_config(sys.stdin)
+        results = cube.set_programmes_from_config(
+            sys.stdin, journal=args.journal, on_progress=print_progress
+        )
+        cube.radio_scheduler.close()
+        for result in results.values():
+            print(
+                f"{result.rf_address}: {len(result.sent)} sent, "
+                f"{len(result.skipped)} unchanged, "
+                f"failed: {', '.join(result.failed) or 'none'}"
+            )
+        if not all(result.ok for result in results.values()):
+            sys.exit(1)
     elif args.cmd == "dump":
         print(cube.devices_as_json())
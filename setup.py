@@ -16,4 +16,5 @@ setup(
     packages=["maxcube"],
     test_suite="tests",
     python_requires=">=3.7",
+    extras_require={"numpy": ["numpy"]},
 )
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime
+from unittest import TestCase
+
+from maxcube.asynccube import AsyncMaxCube
+from maxcube.device import MAX_DEVICE_MODE_MANUAL
+from maxcube.message import Message
+
+from tests.test_cube import INIT_RESPONSE_1, LAST_STATE_MSG
+
+SEND_CMD_OK_RESPONSE = Message("S", "04,0,31")
+
+
+class FakeCube(object):
+    """ Minimal Max! Cube speaking the line protocol on a local port """
+
+    def __init__(self, handshake):
+        self.handshake = handshake
+        self.received = []
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        for msg in self.handshake:
+            writer.write(msg.encode())
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            msg = Message.decode(line)
+            self.received.append(msg)
+            if msg.cmd == "l":
+                writer.write(LAST_STATE_MSG.encode())
+            elif msg.cmd == "s":
+                writer.write(SEND_CMD_OK_RESPONSE.encode())
+            elif msg.cmd == "q":
+                break
+            await writer.drain()
+        writer.close()
+
+
+class TestAsyncMaxCube(TestCase):
+    """ Test the asyncio Max! Cube client """
+
+    def run_with_cube(self, scenario):
+        async def run():
+            fake = FakeCube(INIT_RESPONSE_1)
+            port = await fake.start()
+            try:
+                cube = AsyncMaxCube(
+                    "127.0.0.1", port, now=lambda: datetime(2012, 10, 22, 5, 30)
+                )
+                async with cube:
+                    await scenario(cube)
+            finally:
+                await fake.stop()
+            return fake
+
+        return asyncio.run(run())
+
+    def testConnectLoadsInitialState(self):
+        async def scenario(cube):
+            self.assertEqual("KEQ0566338", cube.serial)
+            self.assertEqual(4, len(cube.devices))
+            self.assertEqual(21.0, cube.devices[0].target_temperature)
+
+        fake = self.run_with_cube(scenario)
+        self.assertEqual([Message("q")], fake.received)
+
+    def testUpdateReusesConnection(self):
+        async def scenario(cube):
+            await cube.update()
+            self.assertEqual(17.0, cube.devices[0].target_temperature)
+
+        fake = self.run_with_cube(scenario)
+        self.assertEqual([Message("l"), Message("q")], fake.received)
+
+    def testSetTargetTemperature(self):
+        async def scenario(cube):
+            device = cube.devices[0]
+            self.assertTrue(await cube.set_target_temperature(device, 24.5))
+            self.assertEqual(24.5, device.target_temperature)
+
+        fake = self.run_with_cube(scenario)
+        self.assertEqual(Message("s", "AARAAAAABrxTATE="), fake.received[0])
+
+    def testConcurrentCommandsAreSerialized(self):
+        async def scenario(cube):
+            results = await asyncio.gather(
+                cube.set_mode(cube.devices[0], MAX_DEVICE_MODE_MANUAL),
+                cube.set_target_temperature(cube.devices[1], 20),
+                cube.update(),
+            )
+            self.assertEqual([True, True], results[:2])
+            self.assertIn("target_temperature", [c.field for c in results[2]])
+
+        fake = self.run_with_cube(scenario)
+        self.assertEqual(["s", "s", "l", "q"], [m.cmd for m in fake.received])
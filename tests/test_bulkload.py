@@ -0,0 +1,113 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from maxcube.bulkload import ProgrammeJournal, interleave, iter_json_array
+
+COMMAND = bytes.fromhex("0000100000000E2EBA010052A249200000000000")
+
+
+class TestIterJsonArray(TestCase):
+    """ Test the streaming JSON array reader """
+
+    def items(self, text, chunk_size=3):
+        return list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+    def testItemsAcrossChunkBoundaries(self):
+        text = ' [ {"rf_address": "0E2EBA", "programme": null},\n[1, 2], "x" ] '
+
+        self.assertEqual(
+            [{"rf_address": "0E2EBA", "programme": None}, [1, 2], "x"],
+            self.items(text),
+        )
+        self.assertEqual(self.items(text), self.items(text, chunk_size=1000))
+
+    def testNumberSplitAcrossChunks(self):
+        self.assertEqual([12345, 6.5], self.items("[12345,6.5]", chunk_size=2))
+        for chunk_size in (1, 2, 3):
+            self.assertEqual([2.5], self.items("[2.5]", chunk_size=chunk_size))
+            self.assertEqual([1e5], self.items("[1e5]", chunk_size=chunk_size))
+            self.assertEqual(
+                [-0.25, True], self.items("[-0.25E0,true]", chunk_size=chunk_size)
+            )
+
+    def testEmptyArray(self):
+        self.assertEqual([], self.items(" [ ] "))
+
+    def testTrailingComma(self):
+        with self.assertRaises(ValueError):
+            self.items("[1, 2, ]")
+
+    def testTruncatedInput(self):
+        reader = iter_json_array(io.StringIO('[{"a": 1}, {"b": '), chunk_size=4)
+
+        self.assertEqual({"a": 1}, next(reader))
+        with self.assertRaises(ValueError):
+            next(reader)
+
+    def testNotAnArray(self):
+        with self.assertRaises(ValueError):
+            self.items('{"a": 1}')
+
+
+class TestInterleave(TestCase):
+    """ Test interleaving of per device queues """
+
+    def testTakesTurns(self):
+        queues = [[1, 2, 3], [], [4], [5, 6]]
+
+        self.assertEqual([1, 4, 5, 2, 6, 3], list(interleave(queues, 3)))
+
+    def testPullsQueuesOnDemand(self):
+        pulled = []
+
+        def queues():
+            for queue in [[1, 2], [3, 4], [5]]:
+                pulled.append(queue)
+                yield queue
+
+        reader = interleave(queues(), 2)
+
+        self.assertEqual([1, 3], [next(reader), next(reader)])
+        self.assertEqual(2, len(pulled))
+        self.assertEqual([2, 4, 5], list(reader))
+
+
+class TestProgrammeJournal(TestCase):
+    """ Test the programme upload journal """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "journal")
+
+    def testReload(self):
+        journal = ProgrammeJournal(self.path)
+        journal.record("0E2EBA", "saturday", COMMAND, "4d20")
+        journal.close()
+
+        journal = ProgrammeJournal(self.path)
+        journal.close()
+
+        self.assertEqual(1, len(journal))
+        self.assertTrue(journal.covers(COMMAND, "4d20"))
+        self.assertFalse(journal.covers(COMMAND, "4120"))
+        self.assertFalse(journal.covers(COMMAND[:-1], "4d20"))
+
+    def testTruncatedLastLine(self):
+        journal = ProgrammeJournal(self.path)
+        journal.record("0E2EBA", "saturday", COMMAND, "4d20")
+        journal.close()
+        with open(self.path, "a") as f:
+            f.write('{"rf_address": "0E2EBA", "da')
+
+        journal = ProgrammeJournal(self.path)
+        journal.record("0E2EBA", "sunday", COMMAND[:-1], "4d20")
+        journal.close()
+        journal = ProgrammeJournal(self.path)
+        journal.close()
+
+        self.assertEqual(2, len(journal))
+        self.assertTrue(journal.covers(COMMAND[:-1], "4d20"))
@@ -0,0 +1,80 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from maxcube.coalescer import TemperatureCoalescer
+from maxcube.cube import MaxCube
+from maxcube.device import MAX_DEVICE_MODE_AUTOMATIC, MAX_DEVICE_MODE_MANUAL
+from maxcube.thermostat import MaxThermostat
+
+
+def thermostat(rf_address):
+    device = MaxThermostat()
+    device.rf_address = rf_address
+    return device
+
+
+class TestTemperatureCoalescer(TestCase):
+    """ Test coalescing of temperature changes """
+
+    def setUp(self):
+        self.cube = MagicMock(MaxCube)
+        self.cube.set_temperature_mode.return_value = True
+        self.coalescer = TemperatureCoalescer(self.cube, delay=0.05)
+
+    def testBurstSendsOnlyLatestTemperature(self):
+        device = thermostat("0A0881")
+        futures = [
+            self.coalescer.set_target_temperature(device, t) for t in (20, 21, 22.5)
+        ]
+
+        self.assertEqual([True] * 3, [f.result(timeout=1) for f in futures])
+        self.cube.set_temperature_mode.assert_called_once_with(device, 22.5, None)
+
+    def testDevicesAreCoalescedSeparately(self):
+        first, second = thermostat("0A0881"), thermostat("0E2EBA")
+        futures = [
+            self.coalescer.set_target_temperature(first, 20),
+            self.coalescer.set_mode(second, MAX_DEVICE_MODE_MANUAL),
+        ]
+
+        self.assertEqual([True] * 2, [f.result(timeout=1) for f in futures])
+        self.assertEqual(2, self.cube.set_temperature_mode.call_count)
+
+    def testModeChangeResetsPendingTemperature(self):
+        device = thermostat("0A0881")
+        self.coalescer.set_target_temperature(device, 20)
+        self.coalescer.set_mode(device, MAX_DEVICE_MODE_AUTOMATIC)
+        self.coalescer.set_mode(device, MAX_DEVICE_MODE_MANUAL)
+        future = self.coalescer.set_target_temperature(device, 19)
+
+        self.assertTrue(future.result(timeout=1))
+        self.cube.set_temperature_mode.assert_called_once_with(
+            device, 19, MAX_DEVICE_MODE_MANUAL
+        )
+
+    def testManualModeKeepsPendingTemperature(self):
+        device = thermostat("0A0881")
+        self.coalescer.set_target_temperature(device, 22.5)
+        future = self.coalescer.set_mode(device, MAX_DEVICE_MODE_MANUAL)
+
+        self.assertTrue(future.result(timeout=1))
+        self.cube.set_temperature_mode.assert_called_once_with(
+            device, 22.5, MAX_DEVICE_MODE_MANUAL
+        )
+
+    def testFlushSendsImmediately(self):
+        self.coalescer = TemperatureCoalescer(self.cube, delay=60)
+        device = thermostat("0A0881")
+        future = self.coalescer.set_target_temperature(device, 20)
+
+        self.coalescer.flush()
+
+        self.assertTrue(future.done())
+        self.cube.set_temperature_mode.assert_called_once_with(device, 20, None)
+
+    def testErrorsArePropagated(self):
+        self.cube.set_temperature_mode.side_effect = OSError
+        future = self.coalescer.set_target_temperature(thermostat("0A0881"), 20)
+
+        with self.assertRaises(OSError):
+            future.result(timeout=1)
@@ -0,0 +1,76 @@
+from math import isnan
+from unittest import TestCase, skipUnless
+
+from maxcube.columns import MISSING
+from maxcube.cube import MaxCubeState
+from maxcube.device import MAX_DEVICE_MODE_MANUAL
+
+from tests.test_cube import INIT_RESPONSE_1, LAST_STATE_MSG
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestDeviceColumns(TestCase):
+    """Test the columnar device store"""
+
+    def setUp(self):
+        self.cube = MaxCubeState()
+        self.cube.parse_messages(INIT_RESPONSE_1)
+        self.columns = self.cube.enable_columns()
+
+    def testColumnsMirrorDevices(self):
+        self.assertEqual(4, len(self.columns))
+        self.assertEqual(
+            ["06BC53", "06BC5A", "08AB82", "06BC5C"],
+            self.columns.rf_addresses(range(4)),
+        )
+        self.assertEqual([1, 2, 3, 4], list(self.columns.column("room_id")))
+        self.assertEqual([27, 35, 0, 11], list(self.columns.column("valve_position")))
+        self.assertTrue(isnan(self.columns.column("actual_temperature")[2]))
+
+    def testParsingUpdatesColumnsInPlace(self):
+        valves = self.columns.column("valve_position")
+        self.cube.parse_messages([LAST_STATE_MSG])
+
+        self.assertEqual([0, 0, 5, 5], list(valves))
+        self.assertEqual([17.0] * 4, list(self.columns.column("target_temperature")))
+
+    def testLocalChangesUpdateColumns(self):
+        thermostat = self.cube.devices[1]
+        self.cube._apply_temperature_mode(thermostat, 23.5, MAX_DEVICE_MODE_MANUAL)
+
+        self.assertEqual(MAX_DEVICE_MODE_MANUAL, self.columns.column("mode")[1])
+        self.assertEqual(23.5, self.columns.column("target_temperature")[1])
+
+    def testSelect(self):
+        rows = self.columns.select("valve_position", lambda valve: valve > 20)
+
+        self.assertEqual(["06BC53", "06BC5A"], self.columns.rf_addresses(rows))
+
+    def testMissingValuesAreSkipped(self):
+        self.cube.devices[0].valve_position = None
+        self.columns.load(self.cube.devices)
+
+        self.assertEqual(MISSING, self.columns.column("valve_position")[0])
+        self.assertEqual(
+            [2, 3], self.columns.select("valve_position", lambda v: v < 20)
+        )
+
+    def testMeanByRoom(self):
+        self.cube.devices[3].room_id = 1
+        self.columns.load(self.cube.devices)
+
+        self.assertEqual(
+            {1: 23.35, 2: 23.1}, self.columns.mean_by_room("actual_temperature")
+        )
+
+    @skipUnless(numpy, "numpy is not installed")
+    def testNumpyExportSharesMemory(self):
+        arrays = self.columns.to_numpy()
+        self.cube.parse_messages([LAST_STATE_MSG])
+
+        self.assertEqual([0, 0, 5, 5], arrays["valve_position"].tolist())
+        self.assertAlmostEqual(23.35, arrays["actual_temperature"][[0, 3]].mean())
@@ -1,8 +1,10 @@
 import base64
+from threading import Event, Thread, Timer
+from time import sleep
 from unittest import TestCase
 from unittest.mock import MagicMock, call, patch
 
-from maxcube.commander import Commander
+from maxcube.commander import Commander, RadioStatus, RequestQueue, radio_request
 from maxcube.connection import Connection
 from maxcube.deadline import Deadline, Timeout
 from maxcube.message import Message
@@ -138,6 +140,135 @@ class TestCommander(TestCase):
         newConnection.send.assert_called_once_with(S_CMD)
         newConnection.close.assert_not_called()
 
+    def testListenConnectsAndCollectsPushedMessages(self, ClassMock):
+        self.init(ClassMock)
+        self.connection.recv.side_effect = [Message("H"), L_CMD_SUCCESS, None]
+
+        self.assertEqual([Message("H"), L_CMD_SUCCESS], self.commander.listen())
+
+        self.connection.recv.side_effect = [L_CMD_SUCCESS, None]
+        self.assertEqual([L_CMD_SUCCESS], self.commander.listen())
+        self.connection.send.assert_not_called()
+
+    def testListenClosesConnectionOnError(self, ClassMock):
+        self.init(ClassMock)
+        self.connection.recv.side_effect = [L_CMD_SUCCESS, OSError]
+        self.commander.listen()
+
+        with self.assertRaises(OSError):
+            self.commander.listen()
+        self.connection.close.assert_called_once()
+
+    def testCallReturnsReply(self, ClassMock):
+        self.init(ClassMock)
+        self.connection.recv.side_effect = [L_CMD_SUCCESS, S_CMD_SUCCESS]
+
+        self.assertEqual(S_CMD_SUCCESS, self.commander.call(S_CMD))
+        self.connection.send.assert_called_once_with(S_CMD)
+
+    def testOperationTimeoutStartsOnceServed(self, ClassMock):
+        self.init(ClassMock)
+        self.connection.recv.side_effect = [L_CMD_SUCCESS, S_CMD_SUCCESS]
+        requests = self.commander._Commander__requests
+        holding, release = Event(), Event()
+
+        def hold():
+            with requests.serve(Deadline(TEST_TIMEOUT)):
+                holding.set()
+                release.wait(1)
+
+        Thread(target=hold).start()
+        holding.wait(1)
+        Timer(0.3, release.set).start()
+
+        reply = self.commander.call(S_CMD, Timeout("short", 0.2))
+        self.assertEqual(S_CMD_SUCCESS, reply)
+
+    def testTrySendRadioMsgReturnsRadioStatus(self, ClassMock):
+        self.init(ClassMock)
+        self.connection.recv.side_effect = [L_CMD_SUCCESS, S_CMD_THROTTLE_ERROR]
+
+        self.assertEqual(
+            RadioStatus(100, False, 0), self.commander.try_send_radio_msg(S_CMD_HEX)
+        )
+        self.connection.send.assert_called_once_with(S_CMD)
+
+    def testRadioRequestAcceptsBytesAndHex(self, ClassMock):
+        self.assertEqual(S_CMD, radio_request(bytes.fromhex(S_CMD_HEX)))
+        self.assertEqual(S_CMD, radio_request(S_CMD_HEX))
+
+    def testSendRadioMsgsPipelinesRequests(self, ClassMock):
+        self.init(ClassMock)
+        self.connection.recv.side_effect = [
+            L_CMD_SUCCESS,  # connection preamble
+            S_CMD_SUCCESS,
+            S_CMD_SUCCESS,
+            S_CMD_SUCCESS,
+        ]
+
+        self.assertEqual(
+            [True, True, True], self.commander.send_radio_msgs([S_CMD_HEX] * 3)
+        )
+        self.connection.send.assert_has_calls([call(S_CMD)] * 3)
+        self.assertEqual(4, self.connection.recv.call_count)
+        self.connection.close.assert_not_called()
+
+    def testSendRadioMsgsRespectsWindow(self, ClassMock):
+        self.init(ClassMock)
+        sent = []
+        self.connection.send.side_effect = lambda msg: sent.append(msg)
+
+        def recv(deadline):
+            if recv.replies == 0:
+                recv.replies += 1
+                return L_CMD_SUCCESS
+            self.assertLessEqual(len(sent) - recv.replies + 1, 2)
+            recv.replies += 1
+            return S_CMD_SUCCESS
+
+        recv.replies = 0
+        self.connection.recv.side_effect = recv
+
+        self.assertEqual(
+            [True] * 5, self.commander.send_radio_msgs([S_CMD_HEX] * 5, window=2)
+        )
+
+    def testSendRadioMsgsRetriesRejectedRequestAlone(self, ClassMock):
+        self.init(ClassMock)
+        self.connection.recv.side_effect = [
+            L_CMD_SUCCESS,  # connection preamble
+            S_CMD_SUCCESS,
+            S_CMD_ERROR,
+            S_CMD_SUCCESS,
+            None,  # flush before retry
+            S_CMD_SUCCESS,
+        ]
+
+        self.assertEqual(
+            [True, True, True], self.commander.send_radio_msgs([S_CMD_HEX] * 3)
+        )
+        self.assertEqual(4, self.connection.send.call_count)
+        self.connection.close.assert_not_called()
+
+    def testSendRadioMsgsRetriesPendingRequestsOnTimeout(self, ClassMock):
+        self.init(ClassMock)
+        self.connection.recv.side_effect = [
+            L_CMD_SUCCESS,  # connection preamble
+            S_CMD_SUCCESS,
+            None,  # no reply for second request
+            L_CMD_SUCCESS,  # new connection preamble
+            S_CMD_SUCCESS,
+            None,  # flush before retry
+            S_CMD_SUCCESS,
+        ]
+
+        self.assertEqual(
+            [True, True, True], self.commander.send_radio_msgs([S_CMD_HEX] * 3)
+        )
+        self.assertEqual(2, ClassMock.call_count)
+        self.connection.close.assert_called_once()
+        self.assertEqual(5, self.connection.send.call_count)
+
     def __send_radio_msg(self, msg: Message, deadline: Deadline):
         with patch("maxcube.commander.Deadline") as deadlineMock:
             deadlineMock.return_value = deadline
@@ -189,3 +320,65 @@ class TestCommander(TestCase):
 
     def __mockCommandResponse(self, response):
         self.connection.recv.side_effect = [None, response]
+
+
+class TestRequestQueue(TestCase):
+    """ Test the queue serializing requests to the cube """
+
+    def setUp(self):
+        self.queue = RequestQueue()
+        self.served = []
+        self.release = Event()
+
+    def __hold(self):
+        held = Event()
+
+        def run():
+            with self.queue.serve(Deadline(TEST_TIMEOUT)):
+                held.set()
+                self.release.wait(1)
+
+        thread = Thread(target=run)
+        thread.start()
+        held.wait(1)
+        return thread
+
+    def __request(self, name):
+        def run():
+            with self.queue.serve(Deadline(TEST_TIMEOUT)):
+                self.served.append(name)
+
+        thread = Thread(target=run)
+        thread.start()
+        sleep(0.02)
+        return thread
+
+    def testRequestsAreServedInArrivalOrder(self):
+        threads = [self.__hold()]
+        threads.extend(self.__request(name) for name in "abc")
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(["a", "b", "c"], self.served)
+
+    def testQueuedRequestFailsWhenItsDeadlineExpires(self):
+        holder = self.__hold()
+        with self.assertRaises(TimeoutError):
+            with self.queue.serve(Deadline(Timeout("short", 0.05))):
+                pass
+        waiter = self.__request("a")
+        self.release.set()
+        holder.join()
+        waiter.join()
+
+        self.assertEqual(["a"], self.served)
+
+    def testServedThreadCanNestRequests(self):
+        with self.queue.serve(Deadline(TEST_TIMEOUT)):
+            with self.queue.serve(Deadline(TEST_TIMEOUT)):
+                self.served.append("nested")
+        waiter = self.__request("a")
+        waiter.join()
+
+        self.assertEqual(["nested", "a"], self.served)
@@ -2,13 +2,27 @@ import socket
 from unittest import TestCase
 from unittest.mock import patch
 
-from maxcube.connection import Connection
+from maxcube.connection import MAX_LINE_LENGTH, Connection
 from maxcube.deadline import Deadline, Timeout
 from maxcube.message import Message
 
 TEST_TIMEOUT = Timeout("test", 1000.0)
 
 
+def chunks(*data):
+    """Emulate socket.recv_into returning the given chunks in order."""
+    pending = list(data)
+
+    def recv_into(buffer, size):
+        chunk = pending.pop(0)
+        if isinstance(chunk, type) and issubclass(chunk, Exception):
+            raise chunk
+        buffer[0 : len(chunk)] = chunk
+        return len(chunk)
+
+    return recv_into
+
+
 @patch("socket.socket", spec=True)
 class TestConnection(TestCase):
     """ Test Max! Cube connections """
@@ -21,7 +35,7 @@ class TestConnection(TestCase):
 
     def testReadAMessage(self, socketMock):
         self.connect(socketMock)
-        self.socket.recv.return_value = b"A:B\r\n"
+        self.socket.recv_into.side_effect = chunks(b"A:B\r\n")
 
         self.assertEqual(
             Message("A", "B"), self.connection.recv(Deadline(TEST_TIMEOUT))
@@ -30,7 +44,7 @@ class TestConnection(TestCase):
 
     def testReadPartialLine(self, socketMock):
         self.connect(socketMock)
-        self.socket.recv.side_effect = [b"A:", b"B\r\n"]
+        self.socket.recv_into.side_effect = chunks(b"A:", b"B\r\n")
 
         self.assertEqual(
             Message("A", "B"), self.connection.recv(Deadline(TEST_TIMEOUT))
@@ -38,28 +52,48 @@ class TestConnection(TestCase):
 
     def testReadMultipleLines(self, socketMock):
         self.connect(socketMock)
-        self.socket.recv.return_value = b"A:B\r\nC\r\n"
+        self.socket.recv_into.side_effect = chunks(b"A:B\r\nC\r\n")
 
         self.assertEqual(
             Message("A", "B"), self.connection.recv(Deadline(TEST_TIMEOUT))
         )
-        self.socket.recv.reset_mock()
+        self.socket.recv_into.reset_mock()
         self.assertEqual(Message("C", ""), self.connection.recv(Deadline(TEST_TIMEOUT)))
 
     def testReadAtConnectionClosing(self, socketMock):
         self.connect(socketMock)
-        self.socket.recv.return_value = b""
+        self.socket.recv_into.side_effect = chunks(b"")
 
         self.assertIsNone(self.connection.recv(Deadline(TEST_TIMEOUT)))
         self.socket.close.assert_called_once()
 
     def testReadTimeout(self, socketMock):
         self.connect(socketMock)
-        self.socket.recv.side_effect = [socket.timeout]
+        self.socket.recv_into.side_effect = chunks(socket.timeout)
 
         self.assertIsNone(self.connection.recv(Deadline(TEST_TIMEOUT)))
         self.socket.close.assert_not_called()
 
+    def testReadLinesAcrossBufferCompaction(self, socketMock):
+        self.connect(socketMock)
+        line = b"C:" + b"A" * 3000 + b"\r\n"
+        self.socket.recv_into.side_effect = chunks(*[line] * 20)
+
+        for _ in range(20):
+            self.assertEqual(
+                Message("C", "A" * 3000), self.connection.recv(Deadline(TEST_TIMEOUT))
+            )
+
+    def testReadTooLongLine(self, socketMock):
+        self.connect(socketMock)
+        block = b"A" * 4096
+        self.socket.recv_into.side_effect = chunks(
+            *[block] * (MAX_LINE_LENGTH // len(block) + 1)
+        )
+
+        with self.assertRaises(ValueError):
+            self.connection.recv(Deadline(TEST_TIMEOUT))
+
     def testSendMessage(self, socketMock):
         self.connect(socketMock)
         self.connection.send(Message("A", "B"))
@@ -1,9 +1,20 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 from typing import List
 from unittest import TestCase
 from unittest.mock import patch
 
+from maxcube.commander import RadioStatus
 from maxcube.cube import MaxCube
+from maxcube.deadline import Timeout
 from maxcube.device import (
     MAX_CUBE,
     MAX_DEVICE_BATTERY_LOW,
@@ -14,9 +25,12 @@ from maxcube.device import (
     MAX_WALL_THERMOSTAT,
     MAX_WINDOW_SHUTTER,
     MaxDevice,
+    MaxDeviceChange,
 )
 from maxcube.message import Message
+from maxcube.programme import WeeklyProgramme
 from maxcube.room import MaxRoom
+from maxcube.wallthermostat import MaxWallThermostat
 
 
 def to_messages(lines):
@@ -68,6 +82,18 @@ INIT_RESPONSE_2 = to_messages(
     ]
 )
 
+# The wall thermostat moved to the room of the thermostat and window shutter
+MIXED_ROOM_RESPONSE = INIT_RESPONSE_2[:1] + to_messages(
+    [
+        b"M:00,01,"
+        + base64.b64encode(
+            base64.b64decode(INIT_RESPONSE_2[1].arg[6:]).replace(
+                b"\x0eWandthermostat\x02", b"\x0eWandthermostat\x01"
+            )
+        )
+    ]
+) + INIT_RESPONSE_2[2:]
+
 LAST_STATE_MSG = Message.decode(
     b"L:Cwa8U/ESGAAiAAAACwa8WgkSGAAiAAAACwa8XAkSGAUiAAAACwirggMSGAUiAAAA"
 )
@@ -164,6 +190,17 @@ class TestMaxCube(TestCase):
         self.assertEqual(17.9, device.actual_temperature)
         self.assertEqual(16.5, device.target_temperature)
 
+    def test_parse_l_message_skips_unknown_devices(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        unknown = bytes.fromhex("0B123456091218092100B300")
+        known = base64.b64decode("DAoIgewSGAQQAAAA5QYMorL3EpALDi66ChIYABAAAAA=")
+        self.cube.parse_l_message(base64.b64encode(unknown + known).decode())
+
+        wall = self.cube.device_by_rf("0A0881")
+        self.assertEqual(8.0, wall.target_temperature)
+        self.assertEqual(22.9, wall.actual_temperature)
+        self.assertFalse(self.cube.device_by_rf("0CA2B2").is_open)
+
     def test_disconnect(self, ClassMock):
         self.init(ClassMock, INIT_RESPONSE_1)
         self.cube.disconnect()
@@ -222,7 +259,9 @@ class TestMaxCube(TestCase):
 
         self.assertEqual(24.5, self.cube.devices[0].target_temperature)
         self.commander.send_radio_msg.assert_called_once()
-        self.commander.send_radio_msg.assert_called_with("00044000000006BC530131")
+        self.commander.send_radio_msg.assert_called_with(
+            bytes.fromhex("00044000000006BC530131")
+        )
 
     def test_do_not_update_if_set_target_temperature_fails(self, ClassMock):
         self.init(ClassMock, INIT_RESPONSE_1)
@@ -232,7 +271,9 @@ class TestMaxCube(TestCase):
 
         self.assertEqual(21, self.cube.devices[0].target_temperature)
         self.commander.send_radio_msg.assert_called_once()
-        self.commander.send_radio_msg.assert_called_with("00044000000006BC530131")
+        self.commander.send_radio_msg.assert_called_with(
+            bytes.fromhex("00044000000006BC530131")
+        )
 
     def test_set_target_temperature_should_round_temperature(self, ClassMock):
         self.init(ClassMock, INIT_RESPONSE_1)
@@ -241,7 +282,9 @@ class TestMaxCube(TestCase):
 
         self.assertEqual(24.5, self.cube.devices[0].target_temperature)
         self.commander.send_radio_msg.assert_called_once()
-        self.commander.send_radio_msg.assert_called_with("00044000000006BC530131")
+        self.commander.send_radio_msg.assert_called_with(
+            bytes.fromhex("00044000000006BC530131")
+        )
 
     def test_set_target_temperature_is_ignored_by_windowshutter(self, ClassMock):
         self.init(ClassMock, INIT_RESPONSE_2)
@@ -256,7 +299,9 @@ class TestMaxCube(TestCase):
 
         self.assertEqual(MAX_DEVICE_MODE_MANUAL, device.mode)
         self.commander.send_radio_msg.assert_called_once()
-        self.commander.send_radio_msg.assert_called_with("00044000000006BC53016A")
+        self.commander.send_radio_msg.assert_called_with(
+            bytes.fromhex("00044000000006BC53016A")
+        )
 
     def test_init_2(self, ClassMock):
         self.init(ClassMock, INIT_RESPONSE_2)
@@ -345,6 +390,15 @@ class TestMaxCube(TestCase):
         self.assertEqual("KEQ0839778", device.serial)
         self.assertEqual(1, device.room_id)
 
+    def test_device_by_rf_accepts_int_and_lowercase(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        device = self.cube.device_by_rf("0CA2B2")
+
+        self.assertIs(device, self.cube.device_by_rf(0x0CA2B2))
+        self.assertIs(device, self.cube.device_by_rf("0ca2b2"))
+        self.assertEqual(0x0CA2B2, device.rf_int)
+        self.assertIsNone(self.cube.device_by_rf("not-hex"))
+
     def test_device_by_rf_negative(self, ClassMock):
         self.init(ClassMock, INIT_RESPONSE_2)
         device = self.cube.device_by_rf("DEADBEEF")
@@ -399,7 +453,7 @@ class TestMaxCube(TestCase):
         self.assertTrue(result)
         self.commander.send_radio_msg.assert_called_once()
         self.commander.send_radio_msg.assert_called_with(
-            "0000100000000E2EBA010052A249200000000000"
+            bytes.fromhex("0000100000000E2EBA010052A249200000000000")
         )
 
     def test_set_programme_already_existing_does_nothing(self, ClassMock):
@@ -410,6 +464,57 @@ class TestMaxCube(TestCase):
         self.assertIsNone(result)
         self.commander.send_radio_msg.assert_not_called()
 
+    def test_set_week_programme_sends_changed_days(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        self.commander.send_radio_msgs.return_value = [True]
+        device = self.cube.devices[0]
+        monday = [{"temp": 8, "until": "05:30"}, {"temp": 21, "until": "06:30"}]
+        programme = dict(
+            INIT_PROGRAMME_1,
+            monday=monday + [{"temp": 8, "until": "24:00"}],
+            saturday=[{"temp": 20.5, "until": "13:30"}, {"temp": 18, "until": "24:00"}],
+        )
+
+        self.assertTrue(self.cube.set_week_programme(device, programme))
+
+        self.commander.send_radio_msgs.assert_called_once_with(
+            [bytes.fromhex("0000100000000E2EBA010052A249200000000000")]
+        )
+        self.assertEqual(programme["saturday"], device.programme["saturday"])
+
+    def test_set_week_programme_merges_room_devices(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        self.commander.send_radio_msgs.return_value = [False]
+        room = self.cube.room_by_id(1)
+        saturday = [{"temp": 20.5, "until": "13:30"}, {"temp": 18, "until": "24:00"}]
+
+        result = self.cube.set_week_programme(room, {"saturday": saturday})
+
+        self.assertFalse(result)
+        self.commander.send_radio_msgs.assert_called_once_with(
+            [bytes.fromhex("0004100000000E2EBA010052A249200000000000")]
+        )
+        self.assertNotEqual(saturday, self.cube.devices[0].programme["saturday"])
+
+    def test_half_degree_day_matches_its_dump(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        device = self.cube.devices[0]
+        # As reported by the cube after setting 20.5 until 13:30, then 18
+        device.programme = WeeklyProgramme.decode(
+            bytes.fromhex("52A24920") + bytes(22), ["saturday"]
+        )
+        dumped = json.loads(json.dumps(device.to_dict()["programme"]))
+
+        self.assertEqual(
+            [{"temp": 20.5, "until": "13:30"}, {"temp": 18, "until": "24:00"}],
+            dumped["saturday"],
+        )
+        self.assertIsNone(
+            self.cube.set_programme(device, "saturday", dumped["saturday"])
+        )
+        self.assertEqual([], self.cube._plan_week_programme(device, dumped))
+        self.commander.send_radio_msg.assert_not_called()
+
     def test_get_device_as_dict(self, ClassMock):
         self.init(ClassMock, INIT_RESPONSE_2)
         device = self.cube.devices[0]
@@ -434,4 +539,359 @@ class TestMaxCube(TestCase):
         self.assertEqual(21.0, device.target_temperature)
         self.assertEqual(MAX_DEVICE_MODE_AUTOMATIC, device.mode)
         self.commander.send_radio_msg.assert_called_once()
-        self.commander.send_radio_msg.assert_called_with("0004400000000E2EBA0100")
+        self.commander.send_radio_msg.assert_called_with(
+            bytes.fromhex("0004400000000E2EBA0100")
+        )
+
+    def test_set_programmes_from_config_schedules_changed_days(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        self.addCleanup(self.cube.radio_scheduler.close)
+        self.commander.try_send_radio_msg.return_value = RadioStatus(4, True, 0x31)
+        config = [
+            {
+                "rf_address": "0E2EBA",
+                "programme": dict(
+                    INIT_PROGRAMME_1,
+                    saturday=[
+                        {"temp": 20.5, "until": "13:30"},
+                        {"temp": 18, "until": "24:00"},
+                    ],
+                ),
+            },
+            {"rf_address": "0A0881", "programme": None},
+        ]
+        progress = []
+
+        results = self.cube.set_programmes_from_config(
+            io.StringIO(json.dumps(config)),
+            on_progress=lambda *args: progress.append(args),
+        )
+
+        self.commander.try_send_radio_msg.assert_called_once_with(
+            bytes.fromhex("0000100000000E2EBA010052A249200000000000")
+        )
+        self.commander.send_radio_msgs.assert_not_called()
+        self.assertEqual(["0E2EBA"], list(results))
+        self.assertEqual(["saturday"], results["0E2EBA"].sent)
+        self.assertEqual(6, len(results["0E2EBA"].skipped))
+        self.assertEqual([(1, "saturday", True)], [(n, u.day, a) for n, u, a in progress])
+
+    def test_set_programmes_from_config_resumes_from_journal(self, ClassMock):
+        saturday = [{"temp": 20.5, "until": "13:30"}, {"temp": 18, "until": "24:00"}]
+        config = json.dumps(
+            [
+                {"rf_address": rf, "programme": {"saturday": saturday}}
+                for rf in ["06BC53", "06BC5A", "06BC5C"]
+            ]
+        )
+        journal = os.path.join(tempfile.mkdtemp(), "journal")
+        self.addCleanup(shutil.rmtree, os.path.dirname(journal))
+
+        def all_but_living(command):
+            return RadioStatus(4, command[6:9] != bytes.fromhex("06BC5A"), 0x31)
+
+        self.init(ClassMock, INIT_RESPONSE_1)
+        self.commander.try_send_radio_msg.side_effect = all_but_living
+        with patch("maxcube.cube.PROGRAMME_UPLOAD_TIMEOUT", Timeout("test", 0.2)):
+            results = self.cube.set_programmes_from_config(
+                io.StringIO(config), journal=journal
+            )
+        self.cube.radio_scheduler.close()
+        self.assertEqual(["saturday"], results["06BC53"].sent)
+        self.assertEqual(["saturday"], results["06BC5A"].failed)
+        self.assertTrue(results["06BC5C"].ok)
+
+        # A new cube still reports the old programmes, but the kitchen
+        # thermostat was reset since
+        self.init(ClassMock, INIT_RESPONSE_1)
+        self.addCleanup(self.cube.radio_scheduler.close)
+        self.commander.try_send_radio_msg.reset_mock(side_effect=True)
+        self.commander.try_send_radio_msg.return_value = RadioStatus(4, True, 0x31)
+        self.cube.devices[0].programme["saturday"] = [{"temp": 21, "until": "24:00"}]
+        results = self.cube.set_programmes_from_config(
+            io.StringIO(config), journal=journal
+        )
+
+        self.assertEqual(
+            [
+                bytes.fromhex("00001000000006BC530100" + "52A249200000000000"),
+                bytes.fromhex("00001000000006BC5A0200" + "52A249200000000000"),
+            ],
+            [c.args[0] for c in self.commander.try_send_radio_msg.call_args_list],
+        )
+        self.assertTrue(all(result.ok for result in results.values()))
+        self.assertEqual(["saturday"], results["06BC5C"].skipped)
+
+    def test_submit_temperature_mode_updates_state_when_accepted(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_1)
+        self.commander.try_send_radio_msg.return_value = RadioStatus(4, True, 0x31)
+        device = self.cube.devices[0]
+
+        future = self.cube.submit_temperature_mode(device, 24.5, None)
+
+        self.assertTrue(future.result(timeout=1))
+        self.assertEqual(24.5, device.target_temperature)
+        self.commander.try_send_radio_msg.assert_called_once_with(
+            bytes.fromhex("00044000000006BC530131")
+        )
+        self.commander.send_radio_msg.assert_not_called()
+        self.cube.radio_scheduler.close()
+
+    def test_cancelled_temperature_mode_is_not_sent(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_1)
+        self.addCleanup(self.cube.radio_scheduler.close)
+        sending, release = threading.Event(), threading.Event()
+
+        def send(command):
+            sending.set()
+            release.wait(1)
+            return RadioStatus(4, True, 0x31)
+
+        self.commander.try_send_radio_msg.side_effect = send
+        first, second = self.cube.devices[:2]
+        target = second.target_temperature
+        sent = self.cube.submit_temperature_mode(first, 24.5, None)
+        sending.wait(1)
+        cancelled = self.cube.submit_temperature_mode(second, 28.0, None)
+
+        self.assertTrue(cancelled.cancel())
+        self.assertFalse(sent.cancel())
+        release.set()
+
+        self.assertTrue(sent.result(timeout=1))
+        self.assertEqual(24.5, first.target_temperature)
+        self.assertEqual(target, second.target_temperature)
+        self.commander.try_send_radio_msg.assert_called_once()
+
+    def test_set_room_temperature(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        room = self.cube.room_by_id(1)
+
+        self.assertTrue(self.cube.set_room_temperature(room, 22))
+
+        self.commander.send_radio_msg.assert_called_once_with(
+            bytes.fromhex("0004400000000E2EBA012C")
+        )
+        self.assertEqual(22, self.cube.devices[0].target_temperature)
+        self.assertIsNone(getattr(self.cube.devices[2], "target_temperature", None))
+
+    def test_set_room_mode_updates_all_thermostats(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_1)
+        room = MaxRoom()
+        room.id = 1
+        room.name = "Kitchen"
+        device = self.cube.devices[0]
+        wall = MaxWallThermostat()
+        wall.type = MAX_WALL_THERMOSTAT
+        wall.rf_address = "0A0881"
+        wall.room_id = 1
+        self.cube.devices.append(wall)
+
+        self.assertTrue(self.cube.set_room_mode(room, MAX_DEVICE_MODE_MANUAL))
+
+        self.commander.send_radio_msg.assert_called_once_with(
+            bytes.fromhex("00044000000006BC53016A")
+        )
+        self.assertEqual(MAX_DEVICE_MODE_MANUAL, device.mode)
+        self.assertEqual(MAX_DEVICE_MODE_MANUAL, wall.mode)
+        self.assertEqual(21.0, wall.target_temperature)
+
+    def test_set_room_auto_mode_with_wall_thermostat(self, ClassMock):
+        self.init(ClassMock, MIXED_ROOM_RESPONSE)
+        room = self.cube.room_by_id(1)
+        thermostat = self.cube.device_by_rf("0E2EBA")
+        wall = self.cube.device_by_rf("0A0881")
+        self.assertEqual([thermostat, wall], self.cube.devices_by_room(room)[:2])
+        wall_target = wall.target_temperature
+
+        self.assertTrue(self.cube.set_room_mode(room, MAX_DEVICE_MODE_AUTOMATIC))
+
+        self.assertEqual(21.0, thermostat.target_temperature)
+        self.assertEqual(MAX_DEVICE_MODE_AUTOMATIC, wall.mode)
+        self.assertEqual(wall_target, wall.target_temperature)
+
+    def test_lookups_follow_device_list_changes(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        room = self.cube.room_by_id(1)
+        thermostat = self.cube.device_by_rf("0E2EBA")
+        shutter = self.cube.device_by_rf("0CA2B2")
+        self.assertEqual([thermostat, shutter], self.cube.devices_by_room(room))
+        self.assertIsNone(self.cube.device_by_rf("123456"))
+        self.assertIsNone(self.cube.room_by_id(3))
+
+        self.cube.devices = [shutter]
+
+        self.assertIsNone(self.cube.device_by_rf("0E2EBA"))
+        self.assertEqual([shutter], self.cube.devices_by_room(room))
+
+        self.cube.update()
+
+        self.assertIs(shutter, self.cube.device_by_rf("0CA2B2"))
+        self.assertEqual(3, len(self.cube.devices))
+        self.assertEqual(
+            ["0CA2B2", "0E2EBA"],
+            [d.rf_address for d in self.cube.devices_by_room(room)],
+        )
+
+    def test_set_room_temperature_without_thermostats(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        room = MaxRoom()
+        room.id = 3
+        room.name = "Empty"
+
+        self.assertIsNone(self.cube.set_room_temperature(room, 22))
+        self.commander.send_radio_msg.assert_not_called()
+
+    def test_listen_returns_device_changes(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_1)
+        self.commander.listen.return_value = [LAST_STATE_MSG]
+
+        changes = self.cube.listen()
+
+        device = self.cube.devices[0]
+        self.assertIn(
+            MaxDeviceChange(device, "target_temperature", 21.0, 17.0), changes
+        )
+        self.assertEqual("06BC53", changes[0].rf_address)
+        self.assertNotIn("battery", [c.field for c in changes if c.device is device])
+
+        self.commander.listen.return_value = [LAST_STATE_MSG]
+        self.assertEqual([], self.cube.listen())
+
+    def test_update_returns_change_set(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        self.commander.update.return_value = INIT_RESPONSE_2
+        self.assertEqual([], self.cube.update())
+
+        device = self.cube.devices[0]
+        self.assertEqual(16.5, device.eco_temperature)
+        device.eco_temperature = 17.0
+        device.programme = {}
+        self.cube.forget_payloads()
+        self.commander.update.return_value = INIT_RESPONSE_2
+        changes = self.cube.update()
+
+        self.assertEqual(
+            [("0E2EBA", "eco_temperature", 17.0, 16.5)],
+            [(c.rf_address, c.field, c.old, c.new) for c in changes[:1]],
+        )
+        self.assertEqual(["eco_temperature", "programme"], [c.field for c in changes])
+        self.assertEqual(INIT_PROGRAMME_1, changes[1].new)
+
+    def test_configuration_is_decoded_on_first_access(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        device = self.cube.devices[0]
+        self.assertFalse(device.config_decoded)
+
+        self.assertEqual(21.5, device.comfort_temperature)
+        self.assertTrue(device.config_decoded)
+        self.assertEqual(INIT_PROGRAMME_1, device.programme)
+
+    def test_new_configuration_replaces_undecoded_one(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        device = self.cube.devices[0]
+        device.eco_temperature = 17.0
+        self.cube.forget_payloads()
+        self.commander.update.return_value = INIT_RESPONSE_2
+
+        self.assertEqual([], self.cube.update())
+        self.assertFalse(device.config_decoded)
+        self.assertEqual(16.5, device.eco_temperature)
+
+    def test_unchanged_payloads_are_skipped(self, ClassMock):
+        valid = [msg for msg in INIT_RESPONSE_2 if "INVALID" not in msg.arg]
+        self.init(ClassMock, valid)
+        parsed = self.cube.records_parsed
+        skipped = self.cube.records_skipped
+        self.commander.update.return_value = valid
+
+        self.assertEqual([], self.cube.update())
+
+        self.assertEqual(parsed, self.cube.records_parsed)
+        self.assertEqual(skipped + parsed, self.cube.records_skipped)
+
+    def test_changed_l_records_are_parsed(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        thermostat = self.cube.device_by_rf("0E2EBA")
+        self.cube.set_target_temperature(thermostat, 24)
+        self.assertEqual(24, thermostat.target_temperature)
+        parsed = self.cube.records_parsed
+        skipped = self.cube.records_skipped
+        self.commander.update.return_value = INIT_RESPONSE_2[-1:]
+
+        changes = self.cube.update()
+
+        self.assertEqual(8.0, thermostat.target_temperature)
+        self.assertEqual(["target_temperature"], [c.field for c in changes])
+        self.assertEqual(parsed + 1, self.cube.records_parsed)
+        self.assertEqual(skipped + 2, self.cube.records_skipped)
+
+    def test_get_programmed_temps_at(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        monday = datetime(2012, 10, 22, 6, 0)
+        thermostat = self.cube.device_by_rf("0E2EBA")
+
+        self.assertEqual({"0E2EBA": 21}, self.cube.get_programmed_temps_at(monday))
+        self.assertEqual(
+            [8, 21, 8],
+            thermostat.get_programmed_temps_at(
+                [monday.replace(hour=5), monday, monday.replace(hour=7)]
+            ),
+        )
+
+    def test_update_within_ttl_uses_cached_state(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        self.cube.update_ttl = 60
+        self.commander.update.return_value = [LAST_STATE_MSG]
+
+        self.assertEqual([], self.cube.update())
+        self.commander.update.assert_not_called()
+
+        self.cube.update_ttl = 0
+        self.cube.update()
+        self.commander.update.assert_called_once()
+
+    def test_concurrent_updates_share_one_request(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        started = threading.Event()
+        release = threading.Event()
+
+        def update():
+            started.set()
+            release.wait(1)
+            return [LAST_STATE_MSG]
+
+        self.commander.update.side_effect = update
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            leader = executor.submit(self.cube.update)
+            started.wait(1)
+            followers = [executor.submit(self.cube.update) for _ in range(2)]
+            time.sleep(0.05)
+            release.set()
+            results = [f.result() for f in [leader] + followers]
+
+        self.commander.update.assert_called_once()
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+
+    def test_concurrent_updates_share_errors(self, ClassMock):
+        self.init(ClassMock, INIT_RESPONSE_2)
+        started = threading.Event()
+        release = threading.Event()
+
+        def update():
+            started.set()
+            release.wait(1)
+            raise OSError("unreachable")
+
+        self.commander.update.side_effect = update
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(self.cube.update)
+            started.wait(1)
+            follower = executor.submit(self.cube.update)
+            time.sleep(0.05)
+            release.set()
+            self.assertRaises(OSError, leader.result)
+            self.assertRaises(OSError, follower.result)
+
+        self.commander.update.assert_called_once()
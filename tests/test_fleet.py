@@ -0,0 +1,77 @@
+from threading import Event
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from maxcube.commander import Commander
+from maxcube.deadline import Timeout
+from maxcube.fleet import MaxCubeFleet
+
+from tests.test_cube import INIT_RESPONSE_1, INIT_RESPONSE_2
+
+TEST_TIMEOUT = Timeout("test", 0.2)
+
+
+@patch("maxcube.fleet.Commander", spec=True)
+class TestMaxCubeFleet(TestCase):
+    """ Test concurrent polling of several Max! Cubes """
+
+    def init(self, ClassMock, *updates):
+        commanders = {}
+
+        def create(host, port):
+            commander = MagicMock(Commander)
+            commander.update.side_effect = updates[len(commanders)]
+            commanders[host] = commander
+            return commander
+
+        ClassMock.side_effect = create
+        hosts = ["cube%d" % i for i in range(len(updates))]
+        self.fleet = MaxCubeFleet(hosts, timeout=TEST_TIMEOUT)
+        self.commanders = commanders
+
+    def testPollAggregatesCubesBySerial(self, ClassMock):
+        self.init(ClassMock, [INIT_RESPONSE_1], [INIT_RESPONSE_2])
+
+        statuses = self.fleet.poll()
+
+        self.assertTrue(statuses["cube0"].ok)
+        self.assertTrue(statuses["cube1"].ok)
+        self.assertEqual("KEQ0566338", statuses["cube0"].serial)
+        self.assertEqual({"KEQ0566338", "JEQ0341267"}, set(self.fleet.cubes))
+        self.assertEqual(4, len(self.fleet.devices["KEQ0566338"]))
+        self.assertEqual(2, len(self.fleet.rooms["JEQ0341267"]))
+
+    def testFailingCubeDoesNotAffectOthers(self, ClassMock):
+        self.init(ClassMock, OSError("unreachable"), [INIT_RESPONSE_2])
+
+        statuses = self.fleet.poll()
+
+        self.assertFalse(statuses["cube0"].ok)
+        self.assertEqual("unreachable", statuses["cube0"].error)
+        self.assertTrue(statuses["cube1"].ok)
+        self.assertIsNotNone(statuses["cube1"].latency)
+        self.assertEqual(["JEQ0341267"], list(self.fleet.cubes))
+
+    def testSlowCubeMissesDeadlineAndIsCollectedLater(self, ClassMock):
+        release = Event()
+
+        def slow_update():
+            release.wait()
+            return INIT_RESPONSE_1
+
+        self.init(ClassMock, slow_update, [INIT_RESPONSE_2, [], []])
+
+        statuses = self.fleet.poll()
+        self.assertFalse(statuses["cube0"].ok)
+        self.assertTrue(statuses["cube1"].ok)
+
+        statuses = self.fleet.poll()
+        self.assertEqual("busy", statuses["cube0"].error)
+        self.assertEqual(1, self.commanders["cube0"].update.call_count)
+
+        self.commanders["cube0"].update.side_effect = [[]]
+        release.set()
+        self.fleet._MaxCubeFleet__members[0].future.result()
+        statuses = self.fleet.poll()
+        self.assertTrue(statuses["cube0"].ok)
+        self.assertIn("KEQ0566338", self.fleet.cubes)
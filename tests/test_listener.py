@@ -0,0 +1,73 @@
+from threading import Event, Thread
+from time import sleep
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from maxcube.cube import MaxCube
+from maxcube.device import MaxDeviceChange
+from maxcube.listener import MaxCubeListener
+from maxcube.thermostat import MaxThermostat
+
+DEVICE = MaxThermostat()
+CHANGE_1 = MaxDeviceChange(DEVICE, "valve_position", 0, 50)
+CHANGE_2 = MaxDeviceChange(DEVICE, "actual_temperature", 20.0, 20.5)
+
+
+class TestMaxCubeListener(TestCase):
+    """ Test the push based event stream """
+
+    def init(self, *results):
+        self.done = Event()
+        results = list(results)
+
+        def listen():
+            if results:
+                result = results.pop(0)
+                if isinstance(result, Exception):
+                    raise result
+                return result
+            self.done.set()
+            return []
+
+        self.cube = MagicMock(MaxCube)
+        self.cube.listen.side_effect = listen
+        self.listener = MaxCubeListener(self.cube, retry_delay=0.01)
+
+    def testCallbacksReceiveChanges(self):
+        self.init([CHANGE_1], [], [CHANGE_2])
+        received = []
+        self.listener.add_callback(received.append)
+
+        self.listener.start()
+        self.assertTrue(self.done.wait(1))
+        self.listener.stop()
+
+        self.assertEqual([CHANGE_1, CHANGE_2], received)
+
+    def testListenerRecoversFromErrors(self):
+        self.init(OSError("connection reset"), [CHANGE_1])
+        received = []
+        self.listener.add_callback(received.append)
+        self.listener.add_callback(lambda change: 1 / 0)
+
+        self.listener.start()
+        self.assertTrue(self.done.wait(1))
+        self.listener.stop()
+
+        self.assertEqual([CHANGE_1], received)
+
+    def testEventsIteratorEndsWhenStopped(self):
+        self.init([CHANGE_1, CHANGE_2])
+        received = []
+        consumer = Thread(target=lambda: received.extend(self.listener.events()))
+        consumer.start()
+        while not self.listener._MaxCubeListener__queues:
+            sleep(0.001)
+
+        self.listener.start()
+        self.assertTrue(self.done.wait(1))
+        self.listener.stop()
+        consumer.join(1)
+
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual([CHANGE_1, CHANGE_2], received)
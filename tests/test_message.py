@@ -15,3 +15,7 @@ class TestMessage(TestCase):
 
     def testDecodeEmptyMessage(self):
         self.assertEqual(Message(""), Message.decode(b"\r\n"))
+
+    def testDecodeFromMemoryview(self):
+        buffer = bytearray(b"xxL:AAAA\r\nyy")
+        self.assertEqual(Message("L", "AAAA"), Message.decode(memoryview(buffer)[2:8]))
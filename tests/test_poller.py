@@ -0,0 +1,99 @@
+from dataclasses import FrozenInstanceError
+from threading import Event, Thread
+from unittest import TestCase
+from unittest.mock import patch
+
+from maxcube.cube import MaxCube
+from maxcube.poller import MaxCubePoller, take_snapshot
+
+from tests.test_cube import INIT_RESPONSE_2, LAST_STATE_MSG
+
+
+@patch("maxcube.cube.Commander", spec=True)
+class TestMaxCubePoller(TestCase):
+    """ Test the background poller """
+
+    def init(self, ClassMock):
+        self.commander = ClassMock.return_value
+        self.commander.update.return_value = INIT_RESPONSE_2
+        self.cube = MaxCube("host", 1234)
+
+    def testInitialSnapshot(self, ClassMock):
+        self.init(ClassMock)
+        snapshot = MaxCubePoller(self.cube).snapshot
+
+        self.assertEqual("JEQ0341267", snapshot.serial)
+        self.assertEqual(3, len(snapshot.devices))
+        device = snapshot.device_by_rf("0E2EBA")
+        self.assertEqual("Thermostat", device.name)
+        self.assertEqual(21.5, device.comfort_temperature)
+        self.assertEqual(8, device.programme["monday"][0]["temp"])
+        self.assertFalse(snapshot.device_by_rf("0CA2B2").is_open)
+        room = snapshot.rooms[0]
+        self.assertEqual(
+            ["Thermostat", "Fensterkontakt"],
+            [d.name for d in snapshot.devices_by_room(room)],
+        )
+
+    def testSnapshotWaitsForStateChanges(self, ClassMock):
+        self.init(ClassMock)
+        snapshots = []
+        taker = Thread(target=lambda: snapshots.append(take_snapshot(self.cube)))
+
+        with self.cube.state_lock:
+            taker.start()
+            taker.join(0.05)
+            self.assertEqual([], snapshots)
+            self.cube.devices[0].target_temperature = 23.0
+        taker.join(1)
+
+        self.assertEqual(23.0, snapshots[0].device_by_rf("0E2EBA").target_temperature)
+
+    def testSnapshotIsImmutable(self, ClassMock):
+        self.init(ClassMock)
+        snapshot = MaxCubePoller(self.cube).snapshot
+        device = snapshot.devices[0]
+
+        with self.assertRaises(FrozenInstanceError):
+            device.target_temperature = 20
+        with self.assertRaises(TypeError):
+            device.programme["monday"][0]["temp"] = 20
+
+        self.cube.devices[0].target_temperature = 30
+        self.assertEqual(8.0, device.target_temperature)
+
+    def testPollPublishesNewSnapshot(self, ClassMock):
+        self.init(ClassMock)
+        updates = []
+        poller = MaxCubePoller(
+            self.cube, on_update=lambda s, changes: updates.append(changes)
+        )
+        first = poller.snapshot
+        self.commander.update.return_value = [LAST_STATE_MSG]
+
+        snapshot = poller.poll()
+        self.assertIs(snapshot, poller.snapshot)
+        self.assertIsNot(first, poller.snapshot)
+        self.assertEqual([[]], updates)
+
+    def testPollErrorsKeepLastSnapshot(self, ClassMock):
+        self.init(ClassMock)
+        poller = MaxCubePoller(self.cube)
+        first = poller.snapshot
+        self.commander.update.side_effect = OSError("unreachable")
+
+        self.assertIs(first, poller.poll())
+        self.assertIsInstance(poller.last_error, OSError)
+
+    def testBackgroundPolling(self, ClassMock):
+        self.init(ClassMock)
+        polled = Event()
+        poller = MaxCubePoller(
+            self.cube, interval=0.01, on_update=lambda s, c: polled.set()
+        )
+        self.commander.update.return_value = [LAST_STATE_MSG]
+
+        poller.start()
+        self.assertTrue(polled.wait(1))
+        poller.stop()
+        self.assertGreater(self.commander.update.call_count, 1)
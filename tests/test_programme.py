@@ -0,0 +1,126 @@
+from array import array
+from datetime import datetime
+from unittest import TestCase
+
+from maxcube.cube import DAYS
+from maxcube.programme import (
+    WeeklyProgramme,
+    decode_day,
+    decode_set_point,
+    encode_day,
+    encode_set_point,
+    normalize_day,
+    same_day,
+)
+
+DAY = bytes.fromhex("40494C6E40CB4D2040CB4D204D204D204D204D204D204D204D20")
+
+
+class TestProgramme(TestCase):
+    """Test the weekly programme codec"""
+
+    def testDecodeSetPoint(self):
+        self.assertEqual({"temp": 16, "until": "06:05"}, decode_set_point(0x4049))
+        self.assertEqual({"temp": 19, "until": "24:00"}, decode_set_point(0x4D20))
+        self.assertEqual({"temp": 20.5, "until": "13:30"}, decode_set_point(0x52A2))
+
+    def testEncodeSetPoint(self):
+        self.assertEqual(0x4049, encode_set_point(16, "06:05"))
+        self.assertEqual(0x4F20, encode_set_point(19.5, "24:00"))
+        self.assertRaises(AssertionError, encode_set_point, 16.2, "06:05")
+        self.assertRaises(AssertionError, encode_set_point, 16, "06:03")
+
+    def testDecodeDayStopsAtEndOfDay(self):
+        self.assertEqual(array("H", [0x4049, 0x4C6E, 0x40CB, 0x4D20]), decode_day(DAY))
+
+    def testDecodeMaterializesDaysLazily(self):
+        programme = WeeklyProgramme.decode(DAY * 2, DAYS)
+
+        self.assertEqual(["saturday", "sunday"], list(programme))
+        self.assertEqual(
+            array("H", [0x4049, 0x4C6E, 0x40CB, 0x4D20]), programme.words("sunday")
+        )
+        self.assertEqual(
+            [
+                {"temp": 16, "until": "06:05"},
+                {"temp": 19, "until": "09:10"},
+                {"temp": 16, "until": "16:55"},
+                {"temp": 19, "until": "24:00"},
+            ],
+            programme["saturday"],
+        )
+
+    def testAssignedDaysAreEncodedOnDemand(self):
+        programme = WeeklyProgramme.decode(DAY, DAYS)
+        programme["saturday"] = [{"temp": 21, "until": "24:00"}]
+        programme["monday"] = [{"temp": 8, "until": "24:00"}]
+
+        self.assertEqual(array("H", [0x5520]), programme.words("saturday"))
+        self.assertEqual(["saturday", "monday"], list(programme))
+        del programme["monday"]
+        self.assertEqual(1, len(programme))
+
+    def testEquality(self):
+        programme = WeeklyProgramme.decode(DAY, DAYS)
+
+        self.assertEqual(WeeklyProgramme.decode(DAY, DAYS), programme)
+        self.assertNotEqual(WeeklyProgramme.decode(DAY[:2] + DAY[4:], DAYS), programme)
+        self.assertEqual({"saturday": programme["saturday"]}, programme)
+        programme["saturday"][0]["temp"] = 20
+        self.assertNotEqual(WeeklyProgramme.decode(DAY, DAYS), programme)
+
+    def testTemperatureAt(self):
+        # 2012-10-22 is a monday, 2012-10-20 a saturday
+        programme = WeeklyProgramme.decode(DAY * 3, DAYS)
+
+        self.assertEqual(16, programme.temperature_at(datetime(2012, 10, 20, 6, 4)))
+        self.assertEqual(19, programme.temperature_at(datetime(2012, 10, 20, 6, 5)))
+        self.assertEqual(19, programme.temperature_at(datetime(2012, 10, 22, 23, 59)))
+        self.assertIsNone(programme.temperature_at(datetime(2012, 10, 23, 12, 0)))
+
+    def testTemperatureAtFollowsAssignedDays(self):
+        programme = WeeklyProgramme.decode(DAY * 3, DAYS)
+        monday = datetime(2012, 10, 22, 12, 0)
+        self.assertEqual(16, programme.temperature_at(monday))
+
+        programme["monday"] = [{"temp": 21.5, "until": "24:00"}]
+        self.assertEqual(21.5, programme.temperature_at(monday))
+
+        del programme["monday"]
+        self.assertIsNone(programme.temperature_at(monday))
+
+    def testEncodeDayPadsToSevenSetPoints(self):
+        payload = encode_day(((20.5, "13:30"), (18, "24:00")))
+
+        self.assertEqual(bytes.fromhex("52A249200000000000"), payload)
+        self.assertIs(payload, encode_day(((20.5, "13:30"), (18, "24:00"))))
+
+    def testNormalizeDayIgnoresPaddingAndTrailingEntries(self):
+        words = decode_day(DAY)
+
+        self.assertEqual(
+            normalize_day(words), normalize_day(list(words) + [0, 0, 0x4D20])
+        )
+        self.assertEqual(
+            normalize_day([0x4120, 0x4D1F, 0x4D20]), normalize_day([0x4120, 0x4D20])
+        )
+
+    def testSameDay(self):
+        programme = WeeklyProgramme.decode(DAY, ["monday"])
+        points = [
+            {"temp": 32, "until": "05:30"},
+            {"temp": 20, "until": "24:00"},
+        ]
+
+        self.assertFalse(same_day(programme, "monday", points))
+        self.assertFalse(same_day(programme, "tuesday", points))
+        self.assertTrue(same_day({"monday": points}, "monday", points + points))
+
+    def testEncodeDayWithMoreThanSevenSetPoints(self):
+        set_points = tuple((20, f"{hour:02}:00") for hour in range(1, 9))
+        set_points += ((18, "24:00"),)
+
+        payload = encode_day(set_points)
+
+        self.assertEqual(18, len(payload))
+        self.assertEqual(bytes.fromhex("4920"), payload[-2:])
@@ -0,0 +1,108 @@
+from threading import Thread
+from unittest import TestCase
+from unittest.mock import patch
+
+from maxcube.connection import Connection
+from maxcube.deadline import Deadline, Timeout
+from maxcube.message import Message
+from maxcube.proxy import (
+    RADIO_MSG_FAILED,
+    UNSUPPORTED_REQUEST,
+    MaxCubeProxy,
+    MaxCubeProxyServer,
+)
+
+from tests.test_cube import INIT_RESPONSE_1, LAST_STATE_MSG
+
+TEST_TIMEOUT = Timeout("test", 2.0)
+S_CMD = Message("s", "AARAAAAABrxTATE=")
+S_CMD_SUCCESS = Message("S", "04,0,31")
+
+
+@patch("maxcube.proxy.Commander", spec=True)
+class TestMaxCubeProxy(TestCase):
+    """ Test the Max! Cube multiplexing proxy """
+
+    def init(self, ClassMock, max_age=60.0):
+        self.commander = ClassMock.return_value
+        self.commander.update.side_effect = [INIT_RESPONSE_1, [LAST_STATE_MSG]]
+        self.proxy = MaxCubeProxy("host", 1234, max_age=max_age)
+        self.server = MaxCubeProxyServer(("127.0.0.1", 0), self.proxy)
+        self.thread = Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        self.thread.start()
+        self.addCleanup(self.shutdown)
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def connect(self) -> Connection:
+        host, port = self.server.server_address
+        connection = Connection(host, port)
+        self.addCleanup(connection.close)
+        return connection
+
+    def recv(self, connection, count):
+        return [connection.recv(Deadline(TEST_TIMEOUT)) for _ in range(count)]
+
+    def testClientsShareCachedHandshake(self, ClassMock):
+        self.init(ClassMock)
+        first = self.recv(self.connect(), len(INIT_RESPONSE_1))
+        second = self.recv(self.connect(), len(INIT_RESPONSE_1))
+
+        self.assertEqual(INIT_RESPONSE_1, first)
+        self.assertEqual(INIT_RESPONSE_1, second)
+        self.commander.update.assert_called_once()
+
+    def testLIsAnsweredFromCache(self, ClassMock):
+        self.init(ClassMock)
+        connection = self.connect()
+        self.recv(connection, len(INIT_RESPONSE_1))
+
+        connection.send(Message("l"))
+        self.assertEqual(INIT_RESPONSE_1[-1], connection.recv(Deadline(TEST_TIMEOUT)))
+        self.commander.update.assert_called_once()
+        self.commander.call.assert_not_called()
+
+    def testLRefreshesStaleState(self, ClassMock):
+        self.init(ClassMock, max_age=0)
+        connection = self.connect()
+        self.recv(connection, len(INIT_RESPONSE_1))
+
+        connection.send(Message("l"))
+        self.assertEqual(LAST_STATE_MSG, connection.recv(Deadline(TEST_TIMEOUT)))
+        self.assertEqual(2, self.commander.update.call_count)
+
+    def testRadioMessagesAreForwarded(self, ClassMock):
+        self.init(ClassMock)
+        self.commander.call.return_value = S_CMD_SUCCESS
+        connection = self.connect()
+        self.recv(connection, len(INIT_RESPONSE_1))
+
+        connection.send(S_CMD)
+        self.assertEqual(S_CMD_SUCCESS, connection.recv(Deadline(TEST_TIMEOUT)))
+        self.assertEqual(S_CMD, self.commander.call.call_args[0][0])
+
+    def testRadioMessageFailuresAreReported(self, ClassMock):
+        self.init(ClassMock)
+        self.commander.call.side_effect = OSError
+        connection = self.connect()
+        self.recv(connection, len(INIT_RESPONSE_1))
+
+        connection.send(S_CMD)
+        self.assertEqual(RADIO_MSG_FAILED, connection.recv(Deadline(TEST_TIMEOUT)))
+
+    def testOtherRequestsAreRejected(self, ClassMock):
+        self.init(ClassMock)
+        connection = self.connect()
+        self.recv(connection, len(INIT_RESPONSE_1))
+
+        connection.send(Message("z", "1E,D,01"))
+        self.assertEqual(
+            UNSUPPORTED_REQUEST, connection.recv(Deadline(TEST_TIMEOUT))
+        )
+        self.commander.call.assert_not_called()
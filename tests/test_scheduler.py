@@ -0,0 +1,138 @@
+from threading import Event
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from maxcube.commander import Commander, RadioStatus
+from maxcube.deadline import Timeout
+from maxcube.scheduler import RadioScheduler
+
+ACCEPTED = RadioStatus(4, True, 0x31)
+REJECTED = RadioStatus(4, False, 0x31)
+SATURATED = RadioStatus(100, False, 0)
+TEST_TIMEOUT = Timeout("test", 2.0)
+
+
+class TestRadioScheduler(TestCase):
+    """ Test the duty cycle aware radio scheduler """
+
+    def init(self, *statuses, timeout=TEST_TIMEOUT):
+        self.commander = MagicMock(Commander)
+        self.commander.try_send_radio_msg.side_effect = list(statuses)
+        self.scheduler = RadioScheduler(
+            self.commander, timeout=timeout, min_backoff=0.01, max_backoff=0.02
+        )
+        self.addCleanup(self.scheduler.close)
+
+    def testMessagesAreSentInOrder(self):
+        self.init(ACCEPTED, ACCEPTED, ACCEPTED)
+        futures = [self.scheduler.submit(msg) for msg in ["01", "02", "03"]]
+
+        self.assertEqual([True] * 3, [f.result(timeout=1) for f in futures])
+        self.assertEqual(
+            ["01", "02", "03"],
+            [c[0][0] for c in self.commander.try_send_radio_msg.call_args_list],
+        )
+        self.assertEqual(ACCEPTED, self.scheduler.status)
+
+    def testRejectedMessageIsRetriedBeforeNextOne(self):
+        self.init(REJECTED, OSError, ACCEPTED, ACCEPTED)
+        first = self.scheduler.submit("01")
+        second = self.scheduler.submit("02")
+
+        self.assertTrue(first.result(timeout=1))
+        self.assertTrue(second.result(timeout=1))
+        self.assertEqual(
+            ["01", "01", "01", "02"],
+            [c[0][0] for c in self.commander.try_send_radio_msg.call_args_list],
+        )
+
+    def testMessageFailsWhenTimeoutExpires(self):
+        self.init(*[REJECTED] * 50, timeout=Timeout("short", 0.1))
+
+        self.assertFalse(self.scheduler.submit("01").result(timeout=1))
+
+    @patch("maxcube.scheduler.DUTY_CYCLE_RECOVERY", 0.01)
+    def testSaturatedCubePausesSubmissions(self):
+        self.init(SATURATED, ACCEPTED)
+        future = self.scheduler.submit("01")
+
+        self.assertTrue(future.result(timeout=1))
+        self.assertEqual(2, self.commander.try_send_radio_msg.call_count)
+
+    @patch("maxcube.scheduler.DUTY_CYCLE_RECOVERY", 10.0)
+    def testPacingGivesUpWhenDeadlineIsTooClose(self):
+        self.init(SATURATED, ACCEPTED, timeout=Timeout("short", 0.5))
+
+        self.assertFalse(self.scheduler.submit("01").result(timeout=1))
+        self.commander.try_send_radio_msg.assert_called_once()
+
+    def testCloseCancelsPendingMessages(self):
+        self.init()
+        self.scheduler.close()
+
+        with self.assertRaises(RuntimeError):
+            self.scheduler.submit("01")
+
+    def blocking_first_send(self, *statuses):
+        sending, release = Event(), Event()
+        statuses = list(statuses)
+
+        def send(msg):
+            if not sending.is_set():
+                sending.set()
+                release.wait(1)
+            return statuses.pop(0)
+
+        self.init()
+        self.commander.try_send_radio_msg.side_effect = send
+        return sending, release
+
+    def testMessageBeingSentCannotBeCancelled(self):
+        sending, release = self.blocking_first_send(ACCEPTED, ACCEPTED)
+        first = self.scheduler.submit("01")
+        sending.wait(1)
+
+        self.assertFalse(first.cancel())
+        release.set()
+        self.assertTrue(first.result(timeout=1))
+        self.assertTrue(self.scheduler.submit("02").result(timeout=1))
+
+    def testCancelledMessagesAreSkipped(self):
+        sending, release = self.blocking_first_send(ACCEPTED, ACCEPTED)
+        first = self.scheduler.submit("01")
+        sending.wait(1)
+        second = self.scheduler.submit("02")
+        third = self.scheduler.submit(bytes.fromhex("03"))
+
+        self.assertTrue(second.cancel())
+        release.set()
+        self.assertTrue(first.result(timeout=1))
+        self.assertTrue(third.result(timeout=1))
+        self.assertEqual(
+            ["01", bytes.fromhex("03")],
+            [c[0][0] for c in self.commander.try_send_radio_msg.call_args_list],
+        )
+
+    def testSchedulerSurvivesErrors(self):
+        self.init(RadioStatus(None, True, 0), ACCEPTED)
+
+        self.assertFalse(self.scheduler.submit("01").result(timeout=1))
+        self.assertTrue(self.scheduler.submit("02").result(timeout=1))
+
+    def testCloseFailsMessagesWaitingForRetry(self):
+        self.init(*[REJECTED] * 50)
+        future = self.scheduler.submit("01")
+        while self.commander.try_send_radio_msg.call_count == 0:
+            pass
+
+        self.scheduler.close()
+
+        self.assertFalse(future.result(timeout=1))
+
+    def testAcceptedCallbackRunsBeforeFutureResolves(self):
+        self.init(REJECTED, ACCEPTED)
+        accepted = []
+        future = self.scheduler.submit("01", on_accepted=lambda: accepted.append(1))
+
+        self.assertTrue(future.result(timeout=1))
+        self.assertEqual([1], accepted)
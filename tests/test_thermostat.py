@@ -1,7 +1,24 @@
+import base64
+from threading import Event, Thread
+import time
 from unittest import TestCase
 
 from maxcube.thermostat import MaxThermostat
 
+CONFIG = base64.b64encode(bytes(18) + bytes([43, 33, 61, 9]) + bytes(7)).decode()
+
+
+class SlowThermostat(MaxThermostat):
+    __slots__ = ()
+    decoding = Event()
+    proceed = Event()
+
+    def decode_config(self, config):
+        values = super().decode_config(config)
+        self.decoding.set()
+        self.proceed.wait(1)
+        return values
+
 
 class TestMessage(TestCase):
     """ Test Max! thermostat """
@@ -9,3 +26,56 @@ class TestMessage(TestCase):
     def testGetCurrentTemperatureReturnsNoneIfUninitialized(self):
         t = MaxThermostat()
         self.assertIsNone(t.get_current_temp_in_auto_mode())
+
+    def testRfAddressKeepsHexAndIntForms(self):
+        t = MaxThermostat()
+        self.assertIsNone(t.rf_address)
+        self.assertIsNone(t.rf_int)
+
+        t.rf_address = 0x0E2EBA
+        self.assertEqual("0E2EBA", t.rf_address)
+
+        t.rf_address = "0a0881"
+        self.assertEqual("0a0881", t.rf_address)
+        self.assertEqual(0x0A0881, t.rf_int)
+
+    def testDevicesHaveNoInstanceDict(self):
+        t = MaxThermostat()
+        self.assertFalse(hasattr(t, "__dict__"))
+        with self.assertRaises(AttributeError):
+            t.unknown = 1
+
+    def testToDictUsesFieldSchema(self):
+        t = MaxThermostat()
+        t.rf_address = "0E2EBA"
+        t.valve_position = 20
+
+        data = t.to_dict()
+
+        self.assertEqual("0E2EBA", data["rf_address"])
+        self.assertEqual(20, data["valve_position"])
+        self.assertEqual({}, data["programme"])
+        self.assertEqual(15, len(data))
+
+    def testConfigurationIsDecodedOnceAcrossThreads(self):
+        t = SlowThermostat()
+        t.set_config(CONFIG)
+        results = {}
+
+        def read(field):
+            results[field] = getattr(t, field)
+
+        first = Thread(target=read, args=("comfort_temperature",))
+        first.start()
+        SlowThermostat.decoding.wait(1)
+        second = Thread(target=read, args=("eco_temperature",))
+        second.start()
+        time.sleep(0.05)
+        SlowThermostat.proceed.set()
+        first.join(1)
+        second.join(1)
+
+        self.assertEqual(
+            {"comfort_temperature": 21.5, "eco_temperature": 16.5}, results
+        )
+        self.assertTrue(t.config_decoded)